@@ -1,52 +1,89 @@
 from flask import Flask
 from flask_cors import CORS
-from config.db_config import db
+from config.db_config import configure_database
 from routes.index import register_routes
-from controllers.public_controller import register_public_routes
+from utils.scheduler import JobScheduler
+import click
+import logging
 import os
+import secrets
+import time
 from dotenv import load_dotenv
 
 # Cargar variables de entorno
 load_dotenv()
 
-app = Flask(__name__)
+logger = logging.getLogger(__name__)
 
-frontend_urls = os.getenv('FRONTEND_URL')
+# Tiempo máximo esperado para crear la app en cada worker
+BOOT_TARGET_MS = int(os.getenv('APP_BOOT_TARGET_MS', '500'))
 
-# Configuración de CORS
-CORS(app, resources={
-    r"/api/*": {
-        "origins": frontend_urls,
-        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"],
-        "supports_credentials": True
-    }
-})
-
-# Configuración de la base de datos - USAR POSTGRESQL
-DATABASE_URL = os.getenv('DATABASE_URL')
-if DATABASE_URL:
-    # PostgreSQL desde .env
-    app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
-    print(f"✓ Conectando a PostgreSQL: {DATABASE_URL.split('@')[1].split('/')[0]}")
-else:
-    # SQLite como fallback
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///encuadrado.db'
-    print("⚠ Usando SQLite local (no hay DATABASE_URL en .env)")
-
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Inicializar la base de datos
-db.init_app(app)
-
-# Registrar rutas
-register_routes(app)
-register_public_routes(app)
-
-# Crear tablas si no existen
-with app.app_context():
-    db.create_all()
-    print("✓ Tablas verificadas/creadas")
+def create_app(config=None):
+    """
+    Crear y configurar la aplicación Flask.
+    No toca el esquema de la base de datos: usar `flask migrate` o `python migrate.py`.
+    """
+    started = time.perf_counter()
+    
+    app = Flask(__name__)
+    if config:
+        app.config.update(config)
+    
+    # Clave para firmar los tokens de sesión; debe ser la misma en todos los workers
+    app.config['SECRET_KEY'] = app.config.get('SECRET_KEY') or os.getenv('SECRET_KEY')
+    if not app.config['SECRET_KEY']:
+        logger.warning("SECRET_KEY no configurada: se usa una clave aleatoria y los tokens no sirven entre procesos")
+        app.config['SECRET_KEY'] = secrets.token_hex(32)
+    
+    frontend_urls = app.config.get('FRONTEND_URL') or os.getenv('FRONTEND_URL')
+    
+    # Configuración de CORS
+    CORS(app, resources={
+        r"/api/*": {
+            "origins": frontend_urls,
+            "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+            "allow_headers": ["Content-Type", "Authorization"],
+            "expose_headers": ["X-Next-Cursor"],
+            "supports_credentials": True
+        }
+    })
+    
+    # Configuración de la base de datos (pool y timeouts vía variables de entorno)
+    configure_database(app)
+    
+    # Registrar rutas
+    register_routes(app)
+    
+    # Comando explícito para crear tablas e índices
+    @app.cli.command('migrate')
+    def migrate_command():
+        """Crear tablas, columnas e índices faltantes"""
+        from config.migrations import run_migrations
+        import models.models  # noqa: F401 - registra los modelos en db.metadata
+        result = run_migrations()
+        click.echo(f"✓ Migración completa: {result}")
+    
+    # Tareas periódicas: hilo con lease en cada worker (se inicia con el primer request)
+    JobScheduler(app)
+    
+    @app.cli.command('run-jobs')
+    def run_jobs_command():
+        """Ejecutar una vez las tareas periódicas (para cron)"""
+        from utils.scheduler import run_jobs_once, new_owner_id
+        result = run_jobs_once(new_owner_id(), release=True)
+        if result is None:
+            click.echo("Otro proceso tiene el lease de las tareas periódicas; no se ejecutó nada")
+        else:
+            click.echo(f"✓ Tareas ejecutadas: {result}")
+    
+    boot_ms = (time.perf_counter() - started) * 1000
+    app.config['BOOT_TIME_MS'] = boot_ms
+    if boot_ms > BOOT_TARGET_MS:
+        logger.warning("App creada en %.1f ms (objetivo: %d ms)", boot_ms, BOOT_TARGET_MS)
+    else:
+        logger.info("App creada en %.1f ms", boot_ms)
+    
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,96 @@
+"""
+Modo ASGI para la API pública.
+
+Las rutas /api/available-* (las más consultadas y limitadas por la latencia
+de la base de datos) se atienden con handlers async sobre un engine async, de
+modo que un solo proceso mantiene muchas consultas en vuelo a la vez. El resto
+de las rutas se delega a la app Flask, que corre en un pool de threads.
+
+    uvicorn --factory asgi:create_asgi_app --workers 4
+"""
+
+from app import create_app
+from config.db_config import create_async_read_engine
+from controllers.public_async_controller import ASYNC_ROUTES
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+from urllib.parse import parse_qsl
+import json
+import os
+
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        # asgiref ejecuta por defecto todas las vistas WSGI en un único thread
+        # compartido; con un contexto por petición cada una usa su propio thread
+        async with ThreadSensitiveContext():
+            await super().__call__(scope, receive, send)
+
+
+def get_allowed_origins(flask_app):
+    """Orígenes permitidos por CORS, los mismos que usa la app Flask"""
+    origins = flask_app.config.get('FRONTEND_URL') or os.getenv('FRONTEND_URL') or ''
+    return {origin.strip() for origin in origins.split(',') if origin.strip()}
+
+
+def create_asgi_app(config=None):
+    """Crear la app ASGI: rutas de disponibilidad async y el resto vía Flask"""
+    flask_app = create_app(config)
+    wsgi_app = ThreadedWsgiToAsgi(flask_app)
+    engine = create_async_read_engine(flask_app)
+    allowed_origins = get_allowed_origins(flask_app)
+
+    def cors_headers(scope):
+        origin = dict(scope['headers']).get(b'origin', b'').decode('latin-1')
+        if not origin or (origin not in allowed_origins and '*' not in allowed_origins):
+            return []
+        return [
+            (b'access-control-allow-origin', origin.encode('latin-1')),
+            (b'access-control-allow-credentials', b'true'),
+            (b'vary', b'Origin'),
+        ]
+
+    async def lifespan(receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def app(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await lifespan(receive, send)
+            return
+
+        handler = None
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+            handler = ASYNC_ROUTES.get(scope['path'])
+
+        if handler is None:
+            await wsgi_app(scope, receive, send)
+            return
+
+        args = dict(parse_qsl(scope['query_string'].decode('latin-1')))
+        payload, status = await handler(engine, args)
+        body = json.dumps(payload).encode('utf-8')
+
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode('latin-1')),
+                *cors_headers(scope),
+            ],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': body if scope['method'] == 'GET' else b'',
+        })
+
+    app.flask_app = flask_app
+    app.engine = engine
+    return app
@@ -0,0 +1,109 @@
+"""
+Benchmark de la API de disponibilidad: compara requests/seg entre servidores.
+
+Ejemplo (misma base de datos, caché desactivada para medir el acceso a la BD):
+
+    AVAILABILITY_CACHE_SIZE=0 gunicorn -w 4 --threads 8 -b :5000 "app:create_app()"
+    AVAILABILITY_CACHE_SIZE=0 uvicorn --factory asgi:create_asgi_app --workers 4 --port 8000
+    python benchmark.py --url wsgi=http://localhost:5000 --url asgi=http://localhost:8000 \\
+        --professional-id 1 --specialty-id 1 -c 64 -n 2000
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import urlopen
+import argparse
+import statistics
+import time
+
+ROUTES = {
+    'slots': '/api/available-slots',
+    'days': '/api/available-days',
+    'range': '/api/available-range',
+}
+
+
+def build_paths(route, professional_id, specialty_id, days):
+    """Rutas a consultar; en 'slots' y 'range' se rotan las fechas para no repetir la misma consulta"""
+    params = {'professional_id': professional_id, 'specialty_id': specialty_id}
+    start = date.today() + timedelta(days=1)
+
+    if route == 'days':
+        return [f"{ROUTES[route]}?{urlencode(params)}"]
+
+    paths = []
+    for offset in range(days):
+        current = start + timedelta(days=offset)
+        if route == 'slots':
+            query = {**params, 'date': current.isoformat()}
+        else:
+            query = {**params, 'start_date': current.isoformat(), 'end_date': (current + timedelta(days=6)).isoformat()}
+        paths.append(f"{ROUTES[route]}?{urlencode(query)}")
+    return paths
+
+
+def fetch(url, timeout):
+    started = time.perf_counter()
+    try:
+        with urlopen(url, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except HTTPError as e:
+        status = e.code
+    except Exception:
+        status = None
+    return status, time.perf_counter() - started
+
+
+def run(base_url, paths, concurrency, total, timeout):
+    urls = [base_url.rstrip('/') + paths[i % len(paths)] for i in range(total)]
+
+    # Calentamiento: abrir conexiones a la BD y cargar módulos en los workers
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda url: fetch(url, timeout), urls[:concurrency]))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda url: fetch(url, timeout), urls))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for status, latency in results if status == 200)
+    errors = sum(1 for status, _ in results if status != 200)
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+    return {
+        'rps': total / elapsed,
+        'p50': quantiles[49] * 1000,
+        'p95': quantiles[94] * 1000,
+        'p99': quantiles[98] * 1000,
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', action='append', required=True, help='nombre=URL base del servidor (repetible)')
+    parser.add_argument('--route', choices=ROUTES, default='slots')
+    parser.add_argument('--professional-id', type=int, required=True)
+    parser.add_argument('--specialty-id', type=int, required=True)
+    parser.add_argument('--days', type=int, default=30, help='cantidad de fechas distintas a consultar')
+    parser.add_argument('-c', '--concurrency', type=int, default=32)
+    parser.add_argument('-n', '--requests', type=int, default=1000)
+    parser.add_argument('--timeout', type=float, default=30)
+    args = parser.parse_args()
+
+    paths = build_paths(args.route, args.professional_id, args.specialty_id, args.days)
+
+    print(f"{'servidor':<10} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errores':>8}")
+    for target in args.url:
+        name, _, base_url = target.rpartition('=')
+        result = run(base_url, paths, args.concurrency, args.requests, args.timeout)
+        print(
+            f"{name or base_url:<10} {result['rps']:>9.1f} {result['p50']:>8.1f} "
+            f"{result['p95']:>8.1f} {result['p99']:>8.1f} {result['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,221 @@
+from flask import g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql.expression import UpdateBase
+import functools
+import logging
+import os
+import sqlite3
+import time
 
-db = SQLAlchemy()
\ No newline at end of file
+logger = logging.getLogger(__name__)
+
+DEFAULT_SQLITE_URI = 'sqlite:///encuadrado.db'
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(Session):
+    """
+    Sesión que envía las lecturas de los handlers marcados con @read_replica a la
+    réplica (si DATABASE_REPLICA_URL está configurada). Los flush y las sentencias
+    INSERT/UPDATE/DELETE siempre van a la base de datos principal.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and not isinstance(clause, UpdateBase)
+            and has_app_context()
+            and g.get('use_read_replica')
+        ):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def read_replica(view):
+    """Marcar un handler de solo lectura para que sus consultas usen la réplica"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.use_read_replica = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def native_insert(dialect):
+    """insert() del dialecto con soporte de ON CONFLICT DO UPDATE, o None si el motor no lo tiene"""
+    if dialect.name == 'postgresql':
+        return postgresql.insert
+    if dialect.name == 'sqlite' and sqlite3.sqlite_version_info >= (3, 35):
+        return sqlite.insert
+    return None
+
+
+def supports_insert_returning(dialect):
+    """True si el motor acepta INSERT ... RETURNING con varias filas (SQLite >= 3.35, PostgreSQL)"""
+    return bool(dialect.insert_returning and (dialect.insert_executemany_returning or dialect.use_insertmanyvalues))
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, '') else default
+
+
+def _env_bool(name, default):
+    value = os.getenv(name)
+    if value in (None, ''):
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que registra cuánto espera cada checkout por una conexión libre"""
+
+    wait_warning_ms = 100
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited_ms = (time.perf_counter() - started) * 1000
+            if waited_ms >= self.wait_warning_ms:
+                logger.warning(
+                    "Espera de %.1f ms por una conexión del pool (checked out: %d, overflow: %d)",
+                    waited_ms, self.checkedout(), self.overflow()
+                )
+            else:
+                logger.debug("Checkout del pool en %.1f ms", waited_ms)
+
+
+def get_database_uri():
+    """URI de la base de datos: DATABASE_URL o SQLite local como fallback"""
+    return os.getenv('DATABASE_URL') or DEFAULT_SQLITE_URI
+
+
+def get_engine_options(database_uri):
+    """
+    Opciones del engine configurables por variables de entorno:
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING,
+    DB_CONNECT_TIMEOUT, DB_STATEMENT_TIMEOUT_MS y DB_POOL_WAIT_WARNING_MS
+    """
+    options = {
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+    }
+
+    if database_uri.startswith('sqlite'):
+        return options
+
+    TimedQueuePool.wait_warning_ms = _env_int('DB_POOL_WAIT_WARNING_MS', 100)
+    options.update({
+        'poolclass': TimedQueuePool,
+        'pool_size': _env_int('DB_POOL_SIZE', 5),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+    })
+
+    if database_uri.startswith('postgres'):
+        connect_args = {'connect_timeout': _env_int('DB_CONNECT_TIMEOUT', 10)}
+        statement_timeout = _env_int('DB_STATEMENT_TIMEOUT_MS', 30000)
+        if statement_timeout:
+            connect_args['options'] = f'-c statement_timeout={statement_timeout}'
+        options['connect_args'] = connect_args
+
+    return options
+
+
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def get_async_engine_options(url):
+    """
+    Opciones del engine async (modo ASGI). Usa DB_ASYNC_POOL_SIZE y
+    DB_ASYNC_MAX_OVERFLOW, más los mismos timeouts que el engine síncrono
+    """
+    options = {
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+    }
+
+    if url.get_backend_name() == 'sqlite':
+        return options
+
+    options.update({
+        'pool_size': _env_int('DB_ASYNC_POOL_SIZE', 20),
+        'max_overflow': _env_int('DB_ASYNC_MAX_OVERFLOW', 20),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+    })
+
+    if url.get_backend_name() == 'postgresql':
+        connect_args = {'timeout': _env_int('DB_CONNECT_TIMEOUT', 10)}
+        statement_timeout = _env_int('DB_STATEMENT_TIMEOUT_MS', 30000)
+        if statement_timeout:
+            connect_args['server_settings'] = {'statement_timeout': str(statement_timeout)}
+        options['connect_args'] = connect_args
+
+    return options
+
+
+def create_async_read_engine(app):
+    """
+    Engine async de solo lectura sobre la base principal de la app Flask. No usa
+    la réplica: los handlers de disponibilidad llenan availability_cache y una
+    réplica atrasada dejaría en caché cupos recién reservados. Reutiliza la URL
+    ya resuelta por Flask-SQLAlchemy
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    with app.app_context():
+        url = db.engine.url
+
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f"No hay driver async configurado para '{backend}'")
+
+    url = url.set(drivername=ASYNC_DRIVERS[backend])
+    options = get_async_engine_options(url)
+
+    # asyncpg no entiende ?sslmode= de psycopg2; se pasa como argumento ssl
+    if backend == 'postgresql' and 'sslmode' in url.query:
+        options['connect_args']['ssl'] = url.query['sslmode']
+        url = url.difference_update_query(['sslmode'])
+
+    return create_async_engine(url, **options)
+
+
+def configure_database(app):
+    """
+    Configurar la conexión, el pool y la extensión SQLAlchemy de una app Flask.
+    Respeta SQLALCHEMY_DATABASE_URI / SQLALCHEMY_BINDS si ya vienen en app.config.
+    """
+    database_uri = app.config.get('SQLALCHEMY_DATABASE_URI') or get_database_uri()
+
+    if database_uri == DEFAULT_SQLITE_URI:
+        logger.warning("Usando SQLite local (no hay DATABASE_URL en .env)")
+    else:
+        logger.info("Base de datos: %s", database_uri.split('@')[-1].split('/')[0])
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', get_engine_options(database_uri))
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Réplica de solo lectura opcional para los handlers marcados con @read_replica
+    replica_uri = os.getenv('DATABASE_REPLICA_URL')
+    if replica_uri and 'SQLALCHEMY_BINDS' not in app.config:
+        logger.info("Réplica de lectura: %s", replica_uri.split('@')[-1].split('/')[0])
+        app.config['SQLALCHEMY_BINDS'] = {
+            REPLICA_BIND: {'url': replica_uri, **get_engine_options(replica_uri)}
+        }
+
+    db.init_app(app)
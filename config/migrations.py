@@ -0,0 +1,278 @@
+from config.db_config import db
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+
+# (tabla, índice) que ya no existen en los modelos
+OBSOLETE_INDEXES = (
+    ('patients', 'ix_patients_rut_key'),  # reemplazado por uq_patients_rut_key
+)
+
+
+def create_index(index):
+    """Crear un índice; en PostgreSQL se usa CONCURRENTLY para no bloquear escrituras"""
+    engine = db.engine
+    if engine.dialect.name == 'postgresql':
+        ddl = str(CreateIndex(index).compile(dialect=engine.dialect))
+        ddl = ddl.replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY IF NOT EXISTS', 1)
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.execute(text(ddl))
+    else:
+        index.create(bind=engine, checkfirst=True)
+
+
+def apply_missing_columns():
+    """Agregar columnas nulables declaradas en los modelos que no existen en la tabla"""
+    inspector = inspect(db.engine)
+    dialect = db.engine.dialect
+    added = []
+
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=dialect)
+            with db.engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            added.append(f'{table.name}.{column.name}')
+
+    return added
+
+
+def apply_missing_indexes():
+    """Crear los índices declarados en los modelos que aún no existen en la base de datos"""
+    inspector = inspect(db.engine)
+    created = []
+
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+
+        existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            if index.name not in existing:
+                create_index(index)
+                created.append(index.name)
+
+    return created
+
+
+def backfill_appointment_end_dates():
+    """Completar appointments.end_date con la duración de la especialidad"""
+    if db.engine.dialect.name == 'postgresql':
+        sql = """
+            UPDATE appointments AS a
+            SET end_date = a.date + s.duration * INTERVAL '1 minute'
+            FROM specialties AS s
+            WHERE s.id = a.specialty_id AND a.end_date IS NULL
+        """
+    else:
+        sql = """
+            UPDATE appointments
+            SET end_date = strftime('%Y-%m-%d %H:%M:%S', date, '+' || (
+                SELECT duration FROM specialties WHERE specialties.id = appointments.specialty_id
+            ) || ' minutes') || '.000000'
+            WHERE end_date IS NULL
+        """
+    with db.engine.begin() as conn:
+        return conn.execute(text(sql)).rowcount
+
+
+def ensure_search_extension():
+    """Habilitar pg_trgm antes de crear el índice de trigramas de pacientes (solo PostgreSQL)"""
+    from models.models import PG_TRGM_DDL
+
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    with db.engine.begin() as conn:
+        conn.execute(text(PG_TRGM_DDL))
+    return True
+
+
+def merge_duplicate_patients():
+    """
+    Unir los pacientes cuyo RUT es el mismo salvo el formato ('12.345.678-5' y
+    '12345678-5'): se conserva el más antiguo y se le traspasan las citas, y se
+    guarda el RUT en su forma canónica. Solo se unen RUT válidos; los inválidos
+    o vacíos no se unen ni se normalizan y se informan para corregirlos a mano.
+    Debe correr antes de canonicalizar los RUT, que son únicos.
+    Retorna (pacientes unidos, ['id: rut'] de los RUT inválidos)
+    """
+    from models.models import Patient, Appointment, PatientSearchToken
+    from utils.text import normalize_rut, is_valid_rut
+
+    groups, stored, invalid = {}, {}, []
+    for patient_id, rut, rut_key in db.session.query(Patient.id, Patient.rut, Patient.rut_key).order_by(Patient.id):
+        stored[patient_id] = (rut, rut_key)
+        if is_valid_rut(rut):
+            groups.setdefault(normalize_rut(rut), []).append(patient_id)
+        else:
+            invalid.append(patient_id)
+
+    merged = 0
+    for keeper_id, *duplicate_ids in (ids for ids in groups.values() if len(ids) > 1):
+        Appointment.query.filter(Appointment.patient_id.in_(duplicate_ids)).update(
+            {Appointment.patient_id: keeper_id}, synchronize_session=False
+        )
+        PatientSearchToken.query.filter(PatientSearchToken.patient_id.in_(duplicate_ids)).delete(synchronize_session=False)
+        Patient.query.filter(Patient.id.in_(duplicate_ids)).delete(synchronize_session=False)
+        merged += len(duplicate_ids)
+
+    # Los RUT inválidos son su propia clave (una versión anterior los recortaba a
+    # dígitos y K); los válidos se guardan en su forma canónica
+    for patient_id in invalid:
+        rut, rut_key = stored[patient_id]
+        if rut_key is not None and rut_key != rut:
+            Patient.query.filter(Patient.id == patient_id).update({Patient.rut_key: rut}, synchronize_session=False)
+    for canonical, (keeper_id, *_) in groups.items():
+        rut, rut_key = stored[keeper_id]
+        if rut != canonical or rut_key not in (None, canonical):
+            Patient.query.filter(Patient.id == keeper_id).update(
+                {Patient.rut: canonical, Patient.rut_key: canonical}, synchronize_session=False
+            )
+    db.session.commit()
+    return merged, [f'{patient_id}: {stored[patient_id][0]!r}' for patient_id in invalid]
+
+
+def drop_obsolete_indexes():
+    """Eliminar índices reemplazados por otros en los modelos"""
+    inspector = inspect(db.engine)
+    dropped = []
+    for table_name, index_name in OBSOLETE_INDEXES:
+        if not inspector.has_table(table_name):
+            continue
+        if index_name in {ix['name'] for ix in inspector.get_indexes(table_name)}:
+            with db.engine.begin() as conn:
+                conn.execute(text(f'DROP INDEX {index_name}'))
+            dropped.append(index_name)
+    return dropped
+
+
+def backfill_patient_search_keys(batch_size=1000):
+    """
+    Calcular las claves de búsqueda de los pacientes creados antes de existir.
+    Al guardar, los eventos del modelo recalculan las claves y las palabras indexadas
+    """
+    from models.models import Patient
+
+    updated = 0
+    while True:
+        patients = Patient.query.filter(Patient.name_key.is_(None)).order_by(Patient.id).limit(batch_size).all()
+        if not patients:
+            return updated
+        for patient in patients:
+            # Cualquier cambio dispara before_update, que completa las tres claves
+            patient.name_key = ''
+        db.session.commit()
+        updated += len(patients)
+
+
+def find_overlapping_active_appointments(limit=100):
+    """Pares (id, id) de citas activas del mismo profesional que se solapan"""
+    sql = """
+        SELECT a.id, b.id
+        FROM appointments AS a
+        JOIN appointments AS b
+          ON b.professional_id = a.professional_id
+         AND b.id > a.id
+         AND b.date < a.end_date
+         AND a.date < b.end_date
+        WHERE a.status IN ('pending', 'confirmed')
+          AND b.status IN ('pending', 'confirmed')
+        ORDER BY a.id, b.id
+        LIMIT :limit
+    """
+    with db.engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(text(sql), {'limit': limit})]
+
+
+def ensure_overlap_constraint():
+    """
+    Crear la restricción de exclusión de citas solapadas (solo PostgreSQL).
+    Si ya hay citas activas solapadas no se crea: retorna (False, pares en conflicto)
+    para resolverlos a mano y volver a migrar. Retorna (creada, conflictos)
+    """
+    from models.models import APPOINTMENT_OVERLAP_CONSTRAINT, APPOINTMENT_OVERLAP_DDL, BTREE_GIST_DDL
+
+    if db.engine.dialect.name != 'postgresql':
+        return False, []
+
+    with db.engine.connect() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM pg_constraint WHERE conname = :name"),
+            {'name': APPOINTMENT_OVERLAP_CONSTRAINT}
+        ).first()
+    if exists:
+        return False, []
+
+    conflicts = find_overlapping_active_appointments()
+    if conflicts:
+        return False, conflicts
+
+    with db.engine.begin() as conn:
+        conn.execute(text(BTREE_GIST_DDL))
+        conn.execute(text(APPOINTMENT_OVERLAP_DDL))
+    return True, []
+
+
+def _has_legacy_keys(schedule):
+    """True si el horario usa claves de día cortas ('mon') o ids de especialidad con ceros a la izquierda"""
+    from utils.schedule import DAY_KEYS_SHORT
+
+    if not isinstance(schedule, dict):
+        return False
+    for specialty_key, specialty_schedule in schedule.items():
+        if str(specialty_key).isdigit() and str(int(specialty_key)) != str(specialty_key):
+            return True
+        if isinstance(specialty_schedule, dict) and any(key in DAY_KEYS_SHORT for key in specialty_schedule):
+            return True
+    return False
+
+
+def normalize_professional_schedules():
+    """
+    Reescribir en su forma canónica los horarios guardados con claves no
+    canónicas; el resto se deja tal cual. Los horarios inválidos no se tocan y se
+    informan para corregirlos a mano
+    """
+    from models.models import Professional
+    from utils.schedule import normalize_schedule, ScheduleValidationError
+    from utils.catalog import bump_catalog_version
+
+    normalized, invalid = [], []
+    for professional in Professional.query.order_by(Professional.id):
+        try:
+            schedule = normalize_schedule(professional.schedule)
+        except ScheduleValidationError as e:
+            invalid.append(f'{professional.id}: {e}')
+            continue
+        if _has_legacy_keys(professional.schedule) and schedule != professional.schedule:
+            professional.schedule = schedule
+            normalized.append(professional.id)
+
+    if normalized:
+        bump_catalog_version()
+    db.session.commit()
+    return normalized, invalid
+
+
+def run_migrations():
+    """Crear tablas nuevas, agregar columnas, índices y restricciones faltantes, completar claves de búsqueda y normalizar los horarios guardados"""
+    db.create_all()
+    result = {
+        'columns': apply_missing_columns(),
+        'backfilled_end_dates': backfill_appointment_end_dates(),
+    }
+    result['merged_patients'], result['invalid_patient_ruts'] = merge_duplicate_patients()
+    result.update({
+        'backfilled_patient_search_keys': backfill_patient_search_keys(),
+        'search_extension': ensure_search_extension(),
+        'dropped_indexes': drop_obsolete_indexes(),
+        'indexes': apply_missing_indexes(),
+    })
+    result['overlap_constraint'], result['overlap_conflicts'] = ensure_overlap_constraint()
+    result['normalized_schedules'], result['invalid_schedules'] = normalize_professional_schedules()
+    return result
@@ -1,11 +1,40 @@
 from flask import jsonify, request
-from models.models import db, Appointment, Patient, Professional, Specialty
+from models.models import db, Appointment, AppointmentSeries, Patient, Professional, Specialty, serialize_appointments
+from config.db_config import read_replica
 from datetime import datetime, timedelta
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, or_
+from sqlalchemy.orm import load_only
+from utils.availability_cache import availability_cache
+from utils.booking import reserve_appointment, SlotConflictError, ACTIVE_STATUSES
+from utils.series import (
+    series_occurrences,
+    find_series_conflicts,
+    reserve_series,
+    invalidate_series_availability,
+    SeriesValidationError
+)
+from utils.appointment_status import (
+    STATUS_TRANSITIONS,
+    MAX_BULK_TRANSITION_IDS,
+    transition_appointments,
+    invalidate_transition_availability
+)
+from utils.auth import scoped_professional_id
 import traceback
+import base64
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+LIST_PAGE_SIZE = 500
+MAX_LIST_PAGE_SIZE = 1000
+TO_CONFIRM_LIST_LIMIT = 100
+
+@read_replica
 def get_dashboard_stats():
-    """Obtener estadísticas y citas del dashboard - SIN auto-actualización de estados"""
+    """
+    Obtener estadísticas y citas del dashboard - SIN auto-actualización de estados
+    Query params: user, period, include_appointments, page, per_page
+    """
     try:
         user_email = request.args.get('user')
         period = request.args.get('period', 'daily')
@@ -25,51 +54,79 @@ def get_dashboard_stats():
                 end_date = now.replace(month=now.month + 1, day=1)
             period_label = 'del mes'
         
-        # Filtrar por profesional si no es admin
-        query = Appointment.query
-        if user_email:
-            professional = Professional.query.filter_by(email=user_email).first()
-            if professional and professional.role != 'admin':
-                query = query.filter(Appointment.professional_id == professional.id)
+        # Filtros comunes: período y profesional si no es admin
+        filters = [Appointment.date >= start_date, Appointment.date < end_date]
+        professional_id = scoped_professional_id(user_email)
+        if professional_id:
+            filters.append(Appointment.professional_id == professional_id)
+        
+        # Conteo por estado en una sola consulta agregada
+        status_counts = dict(
+            db.session.query(Appointment.status, func.count(Appointment.id))
+            .filter(*filters)
+            .group_by(Appointment.status)
+            .all()
+        )
         
-        # Obtener todas las citas del período
-        period_appointments = query.filter(
+        # Por confirmar: las que la tarea periódica ya pasó a 'to_confirm' (ver utils/scheduler.py)
+        # más las pendientes ya pasadas o de la hora actual, así el conteo no depende
+        # de que la tarea haya corrido
+        next_hour = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        to_confirm_filter = or_(
+            Appointment.status == 'to_confirm',
             and_(
-                Appointment.date >= start_date,
-                Appointment.date < end_date
+                Appointment.status == 'pending',
+                Appointment.date < next_hour
             )
-        ).all()
+        )
         
-        # Calcular "to_confirm" en tiempo real
-        current_hour = now.replace(minute=0, second=0, microsecond=0)
-        next_hour = current_hour + timedelta(hours=1)
+        to_confirm_count = db.session.query(func.count(Appointment.id)).filter(
+            *filters, to_confirm_filter
+        ).scalar()
         
-        to_confirm_list = []
-        for apt in period_appointments:
-            if apt.status == 'pending':
-                if apt.date < now or (apt.date >= current_hour and apt.date < next_hour):
-                    to_confirm_list.append(apt)
+        # Solo las primeras TO_CONFIRM_LIST_LIMIT; el total está en stats['to_confirm']
+        to_confirm_list = Appointment.query.options(*Appointment.eager_options()).filter(
+            *filters, to_confirm_filter
+        ).order_by(Appointment.date.asc(), Appointment.id.asc()).limit(TO_CONFIRM_LIST_LIMIT).all()
         
         # Calcular estadísticas
+        total = sum(status_counts.values())
         stats = {
             'period': period_label,
-            'total': len(period_appointments),
-            'pending': len([a for a in period_appointments if a.status == 'pending']),
-            'to_confirm': len(to_confirm_list),
-            'confirmed': len([a for a in period_appointments if a.status == 'confirmed']),
-            'cancelled': len([a for a in period_appointments if a.status == 'cancelled']),
-            'missed': len([a for a in period_appointments if a.status == 'missed']),
+            'total': total,
+            'pending': status_counts.get('pending', 0),
+            'to_confirm': to_confirm_count,
+            'confirmed': status_counts.get('confirmed', 0),
+            'completed': status_counts.get('completed', 0),
+            'cancelled': status_counts.get('cancelled', 0),
+            'missed': status_counts.get('missed', 0),
         }
         
-        # Obtener citas por confirmar (ordenadas por fecha)
-        to_confirm_appointments = [a.to_dict() for a in to_confirm_list]
-        to_confirm_appointments.sort(key=lambda x: x['date'])
-        
-        return jsonify({
+        response = {
             'stats': stats,
-            'to_confirm': to_confirm_appointments,
-            'all_appointments': [a.to_dict() for a in period_appointments]
-        }), 200
+            'to_confirm': serialize_appointments(to_confirm_list)
+        }
+        
+        # Listado completo solo bajo demanda y paginado
+        if request.args.get('include_appointments', 'false').lower() == 'true':
+            page = max(request.args.get('page', 1, type=int), 1)
+            per_page = min(max(request.args.get('per_page', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+            
+            page_appointments = Appointment.query.options(*Appointment.eager_options()).filter(
+                *filters
+            ).order_by(
+                Appointment.date.asc(), Appointment.id.asc()
+            ).offset((page - 1) * per_page).limit(per_page).all()
+            
+            response['all_appointments'] = serialize_appointments(page_appointments)
+            response['pagination'] = {
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': (total + per_page - 1) // per_page
+            }
+        
+        return jsonify(response), 200
         
     except Exception as e:
         print(f"Error getting dashboard data: {str(e)}")
@@ -77,33 +134,99 @@ def get_dashboard_stats():
         return jsonify({"error": str(e)}), 500
 
 
+def encode_cursor(appointment):
+    """Cursor opaco (fecha, id) de la última cita de una página"""
+    raw = f"{appointment.date.isoformat()}|{appointment.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    date_str, appointment_id = raw.rsplit('|', 1)
+    return datetime.fromisoformat(date_str), int(appointment_id)
+
+
+def build_appointment_filters(user_email, start_date, end_date):
+    """Filtros comunes de los listados de citas (profesional y rango de fechas)"""
+    filters = []
+    
+    # Filtrar por profesional si es member
+    professional_id = scoped_professional_id(user_email)
+    if professional_id:
+        filters.append(Appointment.professional_id == professional_id)
+    
+    # Filtrar por rango de fechas
+    if start_date:
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        filters.append(Appointment.date >= start)
+    
+    if end_date:
+        end = datetime.strptime(end_date, '%Y-%m-%d')
+        end = end + timedelta(days=1)
+        filters.append(Appointment.date < end)
+    
+    return filters
+
+
+@read_replica
 def get_all_appointments():
-    """Obtener todas las citas con filtros"""
+    """
+    Obtener citas con filtros, paginación por cursor y proyección de campos
+    Query params: user, start_date, end_date, cursor, limit, fields
+    El cursor de la página siguiente se entrega en el header X-Next-Cursor.
+    """
     try:
-        user_email = request.args.get('user')
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
+        filters = build_appointment_filters(
+            request.args.get('user'),
+            request.args.get('start_date'),
+            request.args.get('end_date')
+        )
+        
+        limit = min(max(request.args.get('limit', LIST_PAGE_SIZE, type=int), 1), MAX_LIST_PAGE_SIZE)
         
-        query = Appointment.query
+        fields = None
+        fields_param = request.args.get('fields')
+        if fields_param:
+            fields = [f.strip() for f in fields_param.split(',') if f.strip()]
+            allowed = Appointment.SCALAR_FIELDS + Appointment.RELATED_FIELDS
+            invalid = [f for f in fields if f not in allowed]
+            if invalid:
+                return jsonify({"error": f"Campos inválidos: {', '.join(invalid)}. Campos válidos: {', '.join(allowed)}"}), 400
         
-        # Filtrar por profesional si es member
-        if user_email:
-            professional = Professional.query.filter_by(email=user_email).first()
-            if professional and professional.role != 'admin':
-                query = query.filter(Appointment.professional_id == professional.id)
+        query = Appointment.query.filter(*filters)
         
-        # Filtrar por rango de fechas
-        if start_date:
-            start = datetime.strptime(start_date, '%Y-%m-%d')
-            query = query.filter(Appointment.date >= start)
+        if fields is None:
+            query = query.options(*Appointment.eager_options())
+        else:
+            related = [f for f in fields if f in Appointment.RELATED_FIELDS]
+            columns = {'id', 'date'} | {f for f in fields if f in Appointment.SCALAR_FIELDS} | {f'{r}_id' for r in related}
+            query = query.options(
+                load_only(*[getattr(Appointment, c) for c in columns]),
+                *Appointment.eager_options(related)
+            )
         
-        if end_date:
-            end = datetime.strptime(end_date, '%Y-%m-%d')
-            end = end + timedelta(days=1)
-            query = query.filter(Appointment.date < end)
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                cursor_date, cursor_id = decode_cursor(cursor)
+            except (ValueError, UnicodeDecodeError):
+                return jsonify({"error": "Cursor inválido"}), 400
+            query = query.filter(or_(
+                Appointment.date > cursor_date,
+                and_(Appointment.date == cursor_date, Appointment.id > cursor_id)
+            ))
         
-        appointments = query.order_by(Appointment.date.asc()).all()
-        return jsonify([apt.to_dict() for apt in appointments]), 200
+        # Pedir una fila extra para saber si existe una página siguiente
+        appointments = query.order_by(Appointment.date.asc(), Appointment.id.asc()).limit(limit + 1).all()
+        has_more = len(appointments) > limit
+        appointments = appointments[:limit]
+        
+        response = jsonify(serialize_appointments(appointments, fields))
+        if has_more:
+            response.headers['X-Next-Cursor'] = encode_cursor(appointments[-1])
+        return response, 200
+    except ValueError as ve:
+        return jsonify({"error": f"Formato de fecha inválido: {str(ve)}"}), 400
     except Exception as e:
         print(f"Error getting appointments: {str(e)}")
         traceback.print_exc()
@@ -144,10 +267,14 @@ def create_appointment_admin():
             notes=data.get('notes', '')
         )
         
-        db.session.add(appointment)
+        reserve_appointment(appointment, specialty.duration)
         db.session.commit()
+        availability_cache.invalidate(appointment.professional_id, appointment.date)
         
         return jsonify(appointment.to_dict()), 201
+    except SlotConflictError:
+        db.session.rollback()
+        return jsonify({"error": "Este horario ya no está disponible"}), 409
     except Exception as e:
         db.session.rollback()
         print(f"Error creating appointment: {str(e)}")
@@ -155,6 +282,94 @@ def create_appointment_admin():
         return jsonify({"error": str(e)}), 500
 
 
+def create_appointment_series():
+    """
+    Crear una serie de citas recurrentes (Admin o Member)
+    Body: patient_id, professional_id, specialty_id, date (primera sesión),
+          frequency ('weekly' o 'biweekly'), count o until (YYYY-MM-DD), status, notes,
+          skip_conflicts (si es true se crean solo las sesiones sin conflicto)
+    Si hay conflictos y skip_conflicts no es true no se crea ninguna sesión.
+    """
+    try:
+        data = request.get_json()
+        
+        required_fields = ['patient_id', 'professional_id', 'specialty_id', 'date', 'frequency']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({"error": f"Campo requerido: {field}"}), 400
+        
+        status = data.get('status', 'pending')
+        if status not in ACTIVE_STATUSES:
+            return jsonify({"error": f"Estado inválido para una serie. Estados válidos: {', '.join(ACTIVE_STATUSES)}"}), 400
+        
+        patient = Patient.query.get(data['patient_id'])
+        if not patient:
+            return jsonify({"error": "Paciente no encontrado"}), 404
+        
+        professional = Professional.query.get(data['professional_id'])
+        if not professional:
+            return jsonify({"error": "Profesional no encontrado"}), 404
+        
+        specialty = Specialty.query.get(data['specialty_id'])
+        if not specialty:
+            return jsonify({"error": "Especialidad no encontrada"}), 404
+        
+        start = datetime.fromisoformat(data['date'].replace('Z', ''))
+        until = datetime.strptime(data['until'], '%Y-%m-%d').date() if data.get('until') else None
+        count = int(data['count']) if data.get('count') is not None else None
+        
+        try:
+            occurrences = series_occurrences(start, data['frequency'], count, until)
+        except SeriesValidationError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        professional_id = professional.id
+        conflicts = find_series_conflicts(professional_id, specialty.id, occurrences, specialty.duration)
+        conflicting = {conflict['date'] for conflict in conflicts}
+        free = [start for start in occurrences if start.isoformat() not in conflicting]
+        
+        if conflicts and (not data.get('skip_conflicts') or not free):
+            return jsonify({
+                "error": f"{len(conflicts)} de {len(occurrences)} sesiones tienen conflictos",
+                "conflicts": conflicts
+            }), 409
+        
+        series = AppointmentSeries(
+            patient_id=patient.id,
+            professional_id=professional_id,
+            specialty_id=specialty.id,
+            frequency=data['frequency'],
+            start_date=start,
+            count=count,
+            until=until
+        )
+        appointments = reserve_series(series, free, specialty.duration, status, data.get('notes', ''))
+        # Serializar antes del commit: el INSERT ... RETURNING ya trajo las filas completas
+        payload = {
+            "series": series.to_dict(),
+            "appointments": serialize_appointments(appointments),
+            "conflicts": conflicts
+        }
+        db.session.commit()
+        invalidate_series_availability(professional_id, free)
+        
+        return jsonify(payload), 201
+    except SlotConflictError as e:
+        db.session.rollback()
+        return jsonify({
+            "error": "Otra reserva ocupó alguno de los horarios, intente nuevamente",
+            "conflicts": e.conflicting or []
+        }), 409
+    except ValueError as ve:
+        db.session.rollback()
+        return jsonify({"error": f"Formato inválido: {str(ve)}"}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating appointment series: {str(e)}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
 def update_appointment_admin(appointment_id):
     """Actualizar una cita (Admin o Member)"""
     try:
@@ -163,6 +378,10 @@ def update_appointment_admin(appointment_id):
             return jsonify({"error": "Cita no encontrada"}), 404
         
         data = request.get_json()
+        previous_date = appointment.date
+        # Cargar la especialidad antes de modificar la cita: la consulta haría
+        # autoflush y reserve_appointment ya no vería el cambio de fecha
+        duration = appointment.specialty.duration
         
         # Actualizar campos permitidos
         if 'date' in data:
@@ -177,8 +396,16 @@ def update_appointment_admin(appointment_id):
         if 'cancellation_reason' in data:
             appointment.cancellation_reason = data['cancellation_reason']
         
+        # Un cambio de fecha o de estado puede ocupar un horario ya tomado
+        if 'date' in data or 'status' in data:
+            reserve_appointment(appointment, duration)
+        
         db.session.commit()
+        availability_cache.invalidate(appointment.professional_id, previous_date, appointment.date)
         return jsonify(appointment.to_dict()), 200
+    except SlotConflictError:
+        db.session.rollback()
+        return jsonify({"error": "Este horario ya no está disponible"}), 409
     except Exception as e:
         db.session.rollback()
         print(f"Error updating appointment: {str(e)}")
@@ -186,6 +413,65 @@ def update_appointment_admin(appointment_id):
         return jsonify({"error": str(e)}), 500
 
 
+def bulk_update_appointment_status():
+    """
+    Cambiar el estado de varias citas en una sola operación
+    Body: ids (lista), status (confirmed, completed, cancelled o missed), cancellation_reason
+    Solo cambian las citas cuyo estado actual permite la transición; el resultado
+    indica por id si se actualizó y su estado final (null si no existe). Las citas
+    que no se pueden confirmar por solaparse con otra cita activa se informan en
+    conflicts y el resto se actualiza igual
+    """
+    try:
+        data = request.get_json() or {}
+        
+        target = data.get('status')
+        if target not in STATUS_TRANSITIONS:
+            return jsonify({"error": f"Estado inválido. Estados válidos: {', '.join(STATUS_TRANSITIONS)}"}), 400
+        
+        ids = data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return jsonify({"error": "ids debe ser una lista no vacía"}), 400
+        if len(ids) > MAX_BULK_TRANSITION_IDS:
+            return jsonify({"error": f"Máximo {MAX_BULK_TRANSITION_IDS} citas por operación"}), 400
+        try:
+            ids = list(dict.fromkeys(int(appointment_id) for appointment_id in ids))
+        except (TypeError, ValueError):
+            return jsonify({"error": "ids debe contener solo números"}), 400
+        
+        updated, unchanged, conflicts = transition_appointments(ids, target, data.get('cancellation_reason'))
+        db.session.commit()
+        invalidate_transition_availability(updated)
+        
+        updated_ids = {row.id for row in updated}
+        results = [
+            {
+                "id": appointment_id,
+                "updated": appointment_id in updated_ids,
+                "status": target if appointment_id in updated_ids else unchanged.get(appointment_id)
+            }
+            for appointment_id in ids
+        ]
+        
+        return jsonify({
+            "status": target,
+            "updated": len(updated_ids),
+            "results": results,
+            "conflicts": conflicts
+        }), 200
+    except SlotConflictError as e:
+        db.session.rollback()
+        return jsonify({
+            "error": "Otra reserva ocupó alguno de los horarios, intente nuevamente",
+            "conflicts": e.conflicting or []
+        }), 409
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error updating appointment statuses: {str(e)}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
 def cancel_appointment(appointment_id):
     """Cancelar una cita"""
     try:
@@ -198,6 +484,7 @@ def cancel_appointment(appointment_id):
         appointment.cancellation_reason = data.get('reason', 'Sin motivo especificado')
         
         db.session.commit()
+        availability_cache.invalidate(appointment.professional_id, appointment.date)
         return jsonify(appointment.to_dict()), 200
     except Exception as e:
         db.session.rollback()
@@ -217,12 +504,19 @@ def reschedule_appointment(appointment_id):
         if 'date' not in data:
             return jsonify({"error": "Nueva fecha requerida"}), 400
         
+        previous_date = appointment.date
+        duration = appointment.specialty.duration
         appointment.date = datetime.fromisoformat(data['date'].replace('Z', ''))
         # Resetear a pending cuando se reagenda
         appointment.status = 'pending'
         
+        reserve_appointment(appointment, duration)
         db.session.commit()
+        availability_cache.invalidate(appointment.professional_id, previous_date, appointment.date)
         return jsonify(appointment.to_dict()), 200
+    except SlotConflictError:
+        db.session.rollback()
+        return jsonify({"error": "Este horario ya no está disponible"}), 409
     except Exception as e:
         db.session.rollback()
         print(f"Error rescheduling appointment: {str(e)}")
@@ -1,5 +1,6 @@
 from flask import jsonify, request
 from models.models import db, CenterConfig
+from utils.catalog import catalog, bump_catalog_version
 
 def get_center_config():
     """Obtener configuración del centro"""
@@ -16,7 +17,9 @@ def get_center_config():
                 vision=''
             )
             db.session.add(config)
+            bump_catalog_version()
             db.session.commit()
+            catalog.invalidate()
         
         return jsonify({
             'id': config.id,
@@ -58,7 +61,9 @@ def update_center_config():
         if 'logo_url' in data:
             config.logo_url = data['logo_url']
         
+        bump_catalog_version()
         db.session.commit()
+        catalog.invalidate()
         
         return jsonify({
             'message': 'Configuración actualizada exitosamente',
@@ -1,11 +1,12 @@
 from flask import jsonify, request
-from models.models import Appointment, Professional
+from models.models import db, Appointment, serialize_appointments
 from datetime import datetime, timedelta
-from sqlalchemy import func, and_
+from sqlalchemy import func
+from utils.auth import scoped_professional_id
 import traceback
 
 def get_appointments():
-    """Obtener estadísticas y citas del dashboard con auto-actualización de estados"""
+    """Obtener estadísticas y citas del dashboard (los estados los actualiza utils/scheduler.py)"""
     try:
         user_email = request.args.get('user')
         period = request.args.get('period', 'daily') 
@@ -25,95 +26,49 @@ def get_appointments():
                 end_date = now.replace(month=now.month + 1, day=1)
             period_label = 'del mes'
         
-        # Auto-actualizar estados de citas
-        update_appointment_states(now)
+        # Filtros comunes: período y profesional si no es admin
+        filters = [Appointment.date >= start_date, Appointment.date < end_date]
+        professional_id = scoped_professional_id(user_email)
+        if professional_id:
+            filters.append(Appointment.professional_id == professional_id)
         
-        # Filtrar por profesional si no es admin
-        query = Appointment.query
-        if user_email:
-            professional = Professional.query.filter_by(email=user_email).first()
-            if professional and professional.role != 'admin':
-                query = query.filter(Appointment.professional_id == professional.id)
+        # Conteo por estado en una sola consulta agregada
+        status_counts = dict(
+            db.session.query(Appointment.status, func.count(Appointment.id))
+            .filter(*filters)
+            .group_by(Appointment.status)
+            .all()
+        )
         
         # Obtener todas las citas del período
-        period_appointments = query.filter(
-            and_(
-                Appointment.date >= start_date,
-                Appointment.date < end_date
-            )
-        ).all()
+        period_appointments = Appointment.query.options(*Appointment.eager_options()).filter(
+            *filters
+        ).order_by(Appointment.date.asc(), Appointment.id.asc()).all()
         
         # Calcular estadísticas
         stats = {
             'period': period_label,
-            'total': len(period_appointments),
-            'pending': len([a for a in period_appointments if a.status == 'pending']),
-            'to_confirm': len([a for a in period_appointments if a.status == 'to_confirm']),
-            'confirmed': len([a for a in period_appointments if a.status == 'confirmed']),
-            'completed': len([a for a in period_appointments if a.status == 'completed']),
-            'cancelled': len([a for a in period_appointments if a.status == 'cancelled']),
-            'missed': len([a for a in period_appointments if a.status == 'missed']),
+            'total': sum(status_counts.values()),
+            'pending': status_counts.get('pending', 0),
+            'to_confirm': status_counts.get('to_confirm', 0),
+            'confirmed': status_counts.get('confirmed', 0),
+            'completed': status_counts.get('completed', 0),
+            'cancelled': status_counts.get('cancelled', 0),
+            'missed': status_counts.get('missed', 0),
         }
         
-        # Obtener citas por confirmar (prioritarias)
-        to_confirm_appointments = [
-            a.to_dict() for a in period_appointments 
-            if a.status == 'to_confirm'
-        ]
+        all_appointments = serialize_appointments(period_appointments)
         
-        # Ordenar por fecha
-        to_confirm_appointments.sort(key=lambda x: x['date'])
+        # Citas por confirmar (prioritarias), ya ordenadas por fecha
+        to_confirm_appointments = [a for a in all_appointments if a['status'] == 'to_confirm']
         
         return jsonify({
             'stats': stats,
             'to_confirm': to_confirm_appointments,
-            'all_appointments': [a.to_dict() for a in period_appointments]
+            'all_appointments': all_appointments
         }), 200
         
     except Exception as e:
         print(f"Error getting dashboard data: {str(e)}")
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
-
-
-def update_appointment_states(now):
-    """
-    Actualizar automáticamente los estados de las citas:
-    - pending -> to_confirm (si la cita es hoy)
-    - confirmed/to_confirm -> completed (si la cita ya pasó)
-    """
-    try:
-        from models.models import db
-        
-        # 1. Cambiar pending a to_confirm si la cita es hoy
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        today_end = today_start + timedelta(days=1)
-        
-        pending_today = Appointment.query.filter(
-            and_(
-                Appointment.status == 'pending',
-                Appointment.date >= today_start,
-                Appointment.date < today_end
-            )
-        ).all()
-        
-        for apt in pending_today:
-            apt.status = 'to_confirm'
-        
-        # 2. Cambiar confirmed/to_confirm a completed si ya pasó la hora
-        past_appointments = Appointment.query.filter(
-            and_(
-                Appointment.status.in_(['confirmed', 'to_confirm']),
-                Appointment.date < now
-            )
-        ).all()
-        
-        for apt in past_appointments:
-            apt.status = 'completed'
-        
-        db.session.commit()
-        
-    except Exception as e:
-        print(f"Error updating appointment states: {str(e)}")
-        traceback.print_exc()
-        db.session.rollback()
\ No newline at end of file
@@ -0,0 +1,139 @@
+from flask import Response, jsonify, request, stream_with_context
+from models.models import db, Appointment, Patient, Professional, Specialty
+from config.db_config import read_replica
+from controllers.appointments_controller import build_appointment_filters
+from datetime import date, datetime
+import traceback
+import json
+import csv
+import io
+
+EXPORT_BATCH_SIZE = 500
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+APPOINTMENT_EXPORT_COLUMNS = [
+    ('id', Appointment.id),
+    ('date', Appointment.date),
+    ('status', Appointment.status),
+    ('patient_id', Patient.id),
+    ('patient_name', Patient.name),
+    ('patient_rut', Patient.rut),
+    ('patient_email', Patient.email),
+    ('professional_id', Professional.id),
+    ('professional_name', Professional.name),
+    ('specialty_id', Specialty.id),
+    ('specialty_name', Specialty.name),
+    ('price', Specialty.price),
+    ('notes', Appointment.notes),
+    ('cancellation_reason', Appointment.cancellation_reason),
+    ('created_at', Appointment.created_at),
+]
+
+PATIENT_EXPORT_COLUMNS = [
+    ('id', Patient.id),
+    ('name', Patient.name),
+    ('email', Patient.email),
+    ('phone', Patient.phone),
+    ('rut', Patient.rut),
+    ('birth_date', Patient.birth_date),
+]
+
+
+def _format_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _stream_rows(query, names, export_format):
+    """Emitir filas una a una sin materializar el resultado completo"""
+    rows = query.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE)
+
+    if export_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(names)
+        for row in rows:
+            writer.writerow([_format_value(v) for v in row])
+            if buffer.tell() >= 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        for row in rows:
+            yield json.dumps(
+                {name: _format_value(value) for name, value in zip(names, row)},
+                ensure_ascii=False
+            ) + '\n'
+
+
+def _export_response(query, columns, export_format, filename):
+    names = [name for name, _ in columns]
+    response = Response(
+        stream_with_context(_stream_rows(query, names, export_format)),
+        mimetype=EXPORT_FORMATS[export_format]
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}.{export_format}'
+    return response
+
+
+@read_replica
+def export_appointments():
+    """
+    Exportar citas en streaming (NDJSON o CSV)
+    Query params: format, user, start_date, end_date
+    """
+    try:
+        export_format = request.args.get('format', 'ndjson').lower()
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": f"Formato inválido. Formatos válidos: {', '.join(EXPORT_FORMATS)}"}), 400
+
+        filters = build_appointment_filters(
+            request.args.get('user'),
+            request.args.get('start_date'),
+            request.args.get('end_date')
+        )
+
+        query = db.session.query(
+            *[column for _, column in APPOINTMENT_EXPORT_COLUMNS]
+        ).select_from(Appointment).join(
+            Patient, Patient.id == Appointment.patient_id
+        ).join(
+            Professional, Professional.id == Appointment.professional_id
+        ).join(
+            Specialty, Specialty.id == Appointment.specialty_id
+        ).filter(*filters).order_by(Appointment.date.asc(), Appointment.id.asc())
+
+        return _export_response(query, APPOINTMENT_EXPORT_COLUMNS, export_format, 'citas')
+    except ValueError as ve:
+        return jsonify({"error": f"Formato de fecha inválido: {str(ve)}"}), 400
+    except Exception as e:
+        print(f"Error exporting appointments: {str(e)}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
+@read_replica
+def export_patients():
+    """
+    Exportar pacientes en streaming (NDJSON o CSV)
+    Query params: format
+    """
+    try:
+        export_format = request.args.get('format', 'ndjson').lower()
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": f"Formato inválido. Formatos válidos: {', '.join(EXPORT_FORMATS)}"}), 400
+
+        query = db.session.query(
+            *[column for _, column in PATIENT_EXPORT_COLUMNS]
+        ).order_by(Patient.id.asc())
+
+        return _export_response(query, PATIENT_EXPORT_COLUMNS, export_format, 'pacientes')
+    except Exception as e:
+        print(f"Error exporting patients: {str(e)}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
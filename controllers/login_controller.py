@@ -1,6 +1,7 @@
 from flask import jsonify, request
-from models.models import Professional
-from werkzeug.security import check_password_hash
+from models.models import db, Professional
+from utils.auth import issue_token, verify_password, SESSION_TOKEN_MAX_AGE
+import traceback
 
 def login():
     """Login de profesionales"""
@@ -21,10 +22,17 @@ def login():
         if not prof:
             return jsonify({"error": "Credenciales inválidas"}), 401
         
-        if not check_password_hash(prof.password_hash, password):
+        is_valid, rehashed = verify_password(prof, password)
+        if not is_valid:
             return jsonify({"error": "Credenciales inválidas"}), 401
         
+        # El hash se guardó con otro método/costo: persistir el nuevo
+        if rehashed:
+            db.session.commit()
+        
         return jsonify({
+            "token": issue_token(prof),
+            "token_expires_in": SESSION_TOKEN_MAX_AGE,
             "id": prof.id,
             "name": prof.name,
             "email": prof.email,
@@ -40,4 +48,7 @@ def login():
         }), 200
         
     except Exception as e:
-        return jsonify({"error": "Error interno del servidor"}), 500
\ No newline at end of file
+        db.session.rollback()
+        print(f"Error in login: {str(e)}")
+        traceback.print_exc()
+        return jsonify({"error": "Error interno del servidor"}), 500
@@ -1,18 +1,55 @@
 from flask import jsonify, request
 from models.models import db, Patient
+from config.db_config import read_replica
+from utils.patient_search import search_patients as run_patient_search
+from utils.patients import duplicate_patient_message
+from utils.text import is_valid_rut
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 import traceback
 
+PATIENT_PAGE_SIZE = 500
+MAX_PATIENT_PAGE_SIZE = 1000
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+PATIENT_TEXT_FIELDS = ('name', 'email', 'phone', 'rut', 'birth_date')
+
+def non_text_fields(data):
+    """Campos del paciente presentes en data que no son texto"""
+    return [field for field in PATIENT_TEXT_FIELDS if field in data and not isinstance(data[field], str)]
+
+@read_replica
 def get_patients():
-    """Obtener todos los pacientes"""
+    """
+    Obtener pacientes ordenados por id, paginados por cursor
+    Query params: cursor, limit
+    El cursor de la página siguiente se entrega en el header X-Next-Cursor.
+    """
     try:
-        patients = Patient.query.all()
-        return jsonify([patient.to_dict() for patient in patients]), 200
+        limit = min(max(request.args.get('limit', PATIENT_PAGE_SIZE, type=int), 1), MAX_PATIENT_PAGE_SIZE)
+        
+        query = Patient.query
+        cursor = request.args.get('cursor')
+        if cursor:
+            if not cursor.isdigit():
+                return jsonify({"error": "Cursor inválido"}), 400
+            query = query.filter(Patient.id > int(cursor))
+        
+        # Pedir una fila extra para saber si existe una página siguiente
+        patients = query.order_by(Patient.id.asc()).limit(limit + 1).all()
+        has_more = len(patients) > limit
+        patients = patients[:limit]
+        
+        response = jsonify([patient.to_dict() for patient in patients])
+        if has_more:
+            response.headers['X-Next-Cursor'] = str(patients[-1].id)
+        return response, 200
     except Exception as e:
         print(f"Error getting patients: {str(e)}")
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@read_replica
 def get_patient(patient_id):
     """Obtener un paciente específico"""
     try:
@@ -35,28 +72,37 @@ def create_patient():
             if field not in data:
                 return jsonify({"error": f"Campo requerido: {field}"}), 400
         
-        # Verificar si el email o RUT ya existen
-        if Patient.query.filter_by(email=data['email']).first():
-            return jsonify({"error": "El email ya está registrado"}), 400
+        invalid_fields = non_text_fields(data)
+        if invalid_fields:
+            return jsonify({"error": f"Deben ser texto: {', '.join(invalid_fields)}"}), 400
         
-        if Patient.query.filter_by(rut=data['rut']).first():
-            return jsonify({"error": "El RUT ya está registrado"}), 400
+        if not is_valid_rut(data['rut']):
+            return jsonify({"error": "RUT inválido"}), 400
         
         # Convertir birth_date string a datetime
         birth_date = datetime.strptime(data['birth_date'], '%Y-%m-%d').date()
         
         patient = Patient(
             name=data['name'],
-            email=data['email'],
+            email=data['email'].strip(),
             phone=data['phone'],
             rut=data['rut'],
             birth_date=birth_date
         )
         
+        # Las restricciones únicas de email y RUT canónico detectan los duplicados al insertar
         db.session.add(patient)
         db.session.commit()
         
         return jsonify(patient.to_dict()), 201
+    except IntegrityError as e:
+        db.session.rollback()
+        message = duplicate_patient_message(e)
+        if message:
+            return jsonify({"error": message}), 400
+        print(f"Error creating patient: {str(e)}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
     except ValueError as ve:
         return jsonify({"error": "Formato de fecha inválido. Use YYYY-MM-DD"}), 400
     except Exception as e:
@@ -74,27 +120,34 @@ def update_patient(patient_id):
         
         data = request.get_json()
         
+        invalid_fields = non_text_fields(data)
+        if invalid_fields:
+            return jsonify({"error": f"Deben ser texto: {', '.join(invalid_fields)}"}), 400
+        
         if 'name' in data:
             patient.name = data['name']
         if 'email' in data:
-            # Verificar que el email no esté en uso por otro paciente
-            existing = Patient.query.filter_by(email=data['email']).first()
-            if existing and existing.id != patient_id:
-                return jsonify({"error": "El email ya está registrado"}), 400
-            patient.email = data['email']
+            patient.email = data['email'].strip()
         if 'phone' in data:
             patient.phone = data['phone']
         if 'rut' in data:
-            # Verificar que el RUT no esté en uso por otro paciente
-            existing = Patient.query.filter_by(rut=data['rut']).first()
-            if existing and existing.id != patient_id:
-                return jsonify({"error": "El RUT ya está registrado"}), 400
+            if not is_valid_rut(data['rut']):
+                return jsonify({"error": "RUT inválido"}), 400
             patient.rut = data['rut']
         if 'birth_date' in data:
             patient.birth_date = datetime.strptime(data['birth_date'], '%Y-%m-%d').date()
         
+        # Un email o RUT en uso por otro paciente viola las restricciones únicas
         db.session.commit()
         return jsonify(patient.to_dict()), 200
+    except IntegrityError as e:
+        db.session.rollback()
+        message = duplicate_patient_message(e)
+        if message:
+            return jsonify({"error": message}), 400
+        print(f"Error updating patient: {str(e)}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
     except ValueError as ve:
         return jsonify({"error": "Formato de fecha inválido. Use YYYY-MM-DD"}), 400
     except Exception as e:
@@ -124,24 +177,26 @@ def delete_patient(patient_id):
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@read_replica
 def search_patients():
-    """Buscar pacientes por nombre, email o RUT"""
+    """
+    Buscar pacientes por RUT, email o nombre, ordenados por relevancia
+    Query params: q, limit, offset
+    """
     try:
         query = request.args.get('q', '')
+        limit = min(max(request.args.get('limit', SEARCH_PAGE_SIZE, type=int), 1), MAX_SEARCH_PAGE_SIZE)
+        offset = max(request.args.get('offset', 0, type=int), 0)
         
-        if not query:
-            return jsonify([]), 200
-        
-        patients = Patient.query.filter(
-            db.or_(
-                Patient.name.ilike(f'%{query}%'),
-                Patient.email.ilike(f'%{query}%'),
-                Patient.rut.ilike(f'%{query}%')
-            )
-        ).all()
+        patients, has_more = run_patient_search(query, limit, offset)
         
-        return jsonify([patient.to_dict() for patient in patients]), 200
+        return jsonify({
+            "patients": [patient.to_dict() for patient in patients],
+            "limit": limit,
+            "offset": offset,
+            "has_more": has_more
+        }), 200
     except Exception as e:
         print(f"Error searching patients: {str(e)}")
         traceback.print_exc()
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
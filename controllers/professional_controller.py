@@ -1,19 +1,37 @@
 from flask import jsonify, request
 from models.models import db, Professional, Specialty, ProfessionalSpecialty
-from werkzeug.security import generate_password_hash
+from config.db_config import read_replica
+from sqlalchemy.orm import selectinload
+from utils.availability_cache import availability_cache
+from utils.catalog import catalog, bump_catalog_version
+from utils.auth import hash_password, invalidate_professional_scope
+from utils.schedule import normalize_schedule, ScheduleValidationError
 import traceback
 
+@read_replica
 def get_professionals():
     """Obtener todos los profesionales con información de términos"""
     try:
         include_terms = request.args.get('include_terms', 'false').lower() == 'true'
-        professionals = Professional.query.all()
-        return jsonify([prof.to_dict(include_terms=include_terms) for prof in professionals]), 200
+        
+        if include_terms:
+            professionals = Professional.query.all()
+            associations = Professional.load_specialty_associations([prof.id for prof in professionals])
+            result = [
+                prof.to_dict(include_terms=True, associations=associations[prof.id])
+                for prof in professionals
+            ]
+        else:
+            professionals = Professional.query.options(selectinload(Professional.specialties)).all()
+            result = [prof.to_dict() for prof in professionals]
+        
+        return jsonify(result), 200
     except Exception as e:
         print(f"Error getting professionals: {str(e)}")
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@read_replica
 def get_professional(professional_id):
     """Obtener un profesional específico con términos"""
     try:
@@ -42,15 +60,21 @@ def create_professional():
         professional = Professional(
             name=data['name'],
             email=data['email'],
-            password_hash=generate_password_hash(data['password']),
+            password_hash=hash_password(data['password']),
             role=data.get('role', 'member'),
-            schedule=data.get('schedule', {})
+            schedule=normalize_schedule(data.get('schedule', {}))
         )
         
         db.session.add(professional)
+        bump_catalog_version()
         db.session.commit()
+        catalog.invalidate()
+        invalidate_professional_scope()
         
         return jsonify(professional.to_dict(include_terms=True)), 201
+    except ScheduleValidationError as e:
+        db.session.rollback()
+        return jsonify({"error": f"Horario inválido: {str(e)}"}), 400
     except Exception as e:
         db.session.rollback()
         print(f"Error creating professional: {str(e)}")
@@ -74,14 +98,23 @@ def update_professional(professional_id):
                 return jsonify({"error": "El email ya está registrado"}), 400
             professional.email = data['email']
         if 'password' in data:
-            professional.password_hash = generate_password_hash(data['password'])
+            professional.password_hash = hash_password(data['password'])
         if 'role' in data:
             professional.role = data['role']
         if 'schedule' in data:
-            professional.schedule = data['schedule']
+            professional.schedule = normalize_schedule(data['schedule'])
         
+        bump_catalog_version()
         db.session.commit()
+        catalog.invalidate()
+        if 'email' in data or 'role' in data:
+            invalidate_professional_scope()
+        if 'schedule' in data:
+            availability_cache.invalidate_professional(professional_id)
         return jsonify(professional.to_dict(include_terms=True)), 200
+    except ScheduleValidationError as e:
+        db.session.rollback()
+        return jsonify({"error": f"Horario inválido: {str(e)}"}), 400
     except Exception as e:
         db.session.rollback()
         print(f"Error updating professional: {str(e)}")
@@ -99,7 +132,11 @@ def delete_professional(professional_id):
             return jsonify({"error": "No se puede eliminar un profesional con citas asociadas"}), 400
         
         db.session.delete(professional)
+        bump_catalog_version()
         db.session.commit()
+        catalog.invalidate()
+        availability_cache.invalidate_professional(professional_id)
+        invalidate_professional_scope()
         
         return jsonify({"message": "Profesional eliminado exitosamente"}), 200
     except Exception as e:
@@ -159,7 +196,10 @@ def assign_specialties(professional_id):
             )
             db.session.add(association)
         
+        bump_catalog_version()
         db.session.commit()
+        catalog.invalidate()
+        availability_cache.invalidate_professional(professional_id)
         return jsonify(professional.to_dict(include_terms=True)), 200
         
     except Exception as e:
@@ -198,7 +238,9 @@ def update_specialty_terms(professional_id, specialty_id):
         association.has_terms = True
         association.is_active = True
         
+        bump_catalog_version()
         db.session.commit()
+        catalog.invalidate()
         
         return jsonify({
             "message": "Términos actualizados exitosamente",
@@ -211,6 +253,7 @@ def update_specialty_terms(professional_id, specialty_id):
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@read_replica
 def get_pending_terms(professional_id):
     """Obtener especialidades sin términos y condiciones"""
     try:
@@ -218,17 +261,17 @@ def get_pending_terms(professional_id):
         if not professional:
             return jsonify({"error": "Profesional no encontrado"}), 404
         
-        pending = []
-        for assoc in professional.specialty_associations:
-            if not assoc.has_terms:
-                specialty = Specialty.query.get(assoc.specialty_id)
-                if specialty:
-                    pending.append({
-                        'specialty_id': specialty.id,
-                        'specialty_name': specialty.name,
-                        'specialty_color': specialty.color,
-                        'assigned_at': assoc.created_at.isoformat() if assoc.created_at else None,
-                    })
+        associations = Professional.load_specialty_associations([professional_id])[professional_id]
+        
+        pending = [
+            {
+                'specialty_id': specialty.id,
+                'specialty_name': specialty.name,
+                'specialty_color': specialty.color,
+                'assigned_at': assoc.created_at.isoformat() if assoc.created_at else None,
+            }
+            for assoc, specialty in associations if not assoc.has_terms
+        ]
         
         return jsonify({
             'count': len(pending),
@@ -253,10 +296,16 @@ def update_professional_schedule(professional_id):
         if not schedule:
             return jsonify({"error": "Falta el horario"}), 400
         
-        professional.schedule = schedule
+        professional.schedule = normalize_schedule(schedule)
+        bump_catalog_version()
         db.session.commit()
+        catalog.invalidate()
+        availability_cache.invalidate_professional(professional_id)
         
         return jsonify(professional.to_dict(include_terms=True)), 200
+    except ScheduleValidationError as e:
+        db.session.rollback()
+        return jsonify({"error": f"Horario inválido: {str(e)}"}), 400
     except Exception as e:
         db.session.rollback()
         print(f"Error updating schedule: {str(e)}")
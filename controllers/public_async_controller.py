@@ -0,0 +1,185 @@
+"""
+Handlers async de disponibilidad para el modo ASGI (ver asgi.py).
+
+Reciben el engine async y los query params, y retornan (payload, status).
+Las cuatro consultas (horario del profesional, sus especialidades, las citas
+y los bloqueos de agenda del rango) no dependen entre sí, así que se lanzan en paralelo sobre
+conexiones distintas: la latencia de la base de datos se paga una sola vez.
+"""
+
+from models.models import Professional, Specialty, Appointment, ProfessionalSpecialty, ScheduleException
+from controllers.public_controller import AVAILABLE_DAYS_WINDOW, parse_range, validate_range
+from utils.availability import busy_intervals_by_day, add_blocked_intervals, compute_days_availability
+from utils.availability_cache import availability_cache
+from utils.schedule import compile_weekly_schedule
+from utils.booking import ACTIVE_STATUSES
+from sqlalchemy import select
+from datetime import datetime, timedelta
+import asyncio
+import traceback
+
+
+def _int_arg(args, name):
+    try:
+        return int(args.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+async def _fetch_all(engine, statement):
+    async with engine.connect() as conn:
+        return (await conn.execute(statement)).all()
+
+
+async def load_days_availability_async(engine, professional_id, specialty_id, start_date, end_date):
+    """
+    Versión async de load_days_availability.
+    Retorna (days, error) donde error es (mensaje, status) si el profesional o la
+    especialidad no son válidos
+    """
+    range_start = datetime.combine(start_date, datetime.min.time())
+    range_end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+
+    professional_rows, specialty_rows, appointments, exceptions = await asyncio.gather(
+        _fetch_all(engine, select(Professional.schedule).where(Professional.id == professional_id)),
+        _fetch_all(
+            engine,
+            select(Specialty.id, Specialty.duration).join(
+                ProfessionalSpecialty, ProfessionalSpecialty.specialty_id == Specialty.id
+            ).where(ProfessionalSpecialty.professional_id == professional_id)
+        ),
+        _fetch_all(
+            engine,
+            select(Appointment.date, Appointment.end_date, Appointment.specialty_id).where(
+                Appointment.professional_id == professional_id,
+                Appointment.date >= range_start,
+                Appointment.date < range_end,
+                Appointment.status.in_(ACTIVE_STATUSES)
+            )
+        ),
+        _fetch_all(
+            engine,
+            select(ScheduleException.start_date, ScheduleException.end_date).where(
+                *ScheduleException.overlap_filters(professional_id, range_start, range_end)
+            )
+        ),
+    )
+
+    if not professional_rows:
+        return None, ('Profesional no encontrado', 404)
+
+    durations = {row.id: row.duration for row in specialty_rows}
+    if specialty_id not in durations:
+        return None, ('El profesional no tiene esa especialidad', 400)
+
+    specialty_schedule = (professional_rows[0].schedule or {}).get(str(specialty_id))
+    if not specialty_schedule:
+        return [], None
+    weekly = compile_weekly_schedule(specialty_schedule)
+
+    busy_by_day = busy_intervals_by_day(appointments, durations)
+    add_blocked_intervals(busy_by_day, exceptions, start_date, end_date)
+    days = compute_days_availability(weekly, busy_by_day, durations[specialty_id], start_date, end_date)
+    availability_cache.set_range(professional_id, specialty_id, start_date, end_date, days)
+    return days, None
+
+
+async def get_available_days(engine, args):
+    """Obtener días disponibles para un profesional y especialidad"""
+    try:
+        professional_id = _int_arg(args, 'professional_id')
+        specialty_id = _int_arg(args, 'specialty_id')
+
+        if not professional_id or not specialty_id:
+            return {'error': 'professional_id y specialty_id son requeridos'}, 400
+
+        today = datetime.now().date()
+        start_date = today + timedelta(days=1)
+        end_date = today + timedelta(days=AVAILABLE_DAYS_WINDOW)
+
+        days = availability_cache.get_range(professional_id, specialty_id, start_date, end_date)
+        if days is None:
+            days, error = await load_days_availability_async(engine, professional_id, specialty_id, start_date, end_date)
+            if error:
+                return {'error': error[0]}, error[1]
+
+        available_days = [
+            {key: value for key, value in day.items() if key != 'slots'}
+            for day in days
+        ]
+
+        return {'available_days': available_days}, 200
+
+    except Exception as e:
+        print(f"Error getting available days: {str(e)}")
+        traceback.print_exc()
+        return {'error': str(e)}, 500
+
+
+async def get_available_range(engine, args):
+    """Obtener días y horarios disponibles de un rango de fechas"""
+    try:
+        professional_id = _int_arg(args, 'professional_id')
+        specialty_id = _int_arg(args, 'specialty_id')
+
+        if not professional_id or not specialty_id:
+            return {'error': 'professional_id y specialty_id son requeridos'}, 400
+
+        start_date, end_date = parse_range(args.get('start_date'), args.get('end_date'))
+        range_error = validate_range(start_date, end_date)
+        if range_error:
+            return {'error': range_error}, 400
+
+        days = availability_cache.get_range(professional_id, specialty_id, start_date, end_date)
+        if days is None:
+            days, error = await load_days_availability_async(engine, professional_id, specialty_id, start_date, end_date)
+            if error:
+                return {'error': error[0]}, error[1]
+
+        return {'available_days': days}, 200
+
+    except ValueError as e:
+        return {'error': f'Formato de fecha inválido: {str(e)}'}, 400
+    except Exception as e:
+        print(f"Error getting available range: {str(e)}")
+        traceback.print_exc()
+        return {'error': str(e)}, 500
+
+
+async def get_available_slots(engine, args):
+    """Obtener horarios disponibles para un día específico"""
+    try:
+        professional_id = _int_arg(args, 'professional_id')
+        specialty_id = _int_arg(args, 'specialty_id')
+        date_str = args.get('date')
+
+        if not all([professional_id, specialty_id, date_str]):
+            return {'error': 'Faltan parámetros requeridos'}, 400
+
+        date = datetime.strptime(date_str, '%Y-%m-%d').date()
+
+        days = availability_cache.get_range(professional_id, specialty_id, date, date)
+        if days is None:
+            days, error = await load_days_availability_async(engine, professional_id, specialty_id, date, date)
+            if error:
+                # Igual que la ruta WSGI: 404 si el profesional o la especialidad no
+                # existen y una lista vacía si el profesional no tiene esa especialidad
+                if error[1] == 404 or not await _fetch_all(engine, select(Specialty.id).where(Specialty.id == specialty_id)):
+                    return {'error': 'Profesional o especialidad no encontrados'}, 404
+                return {'available_slots': []}, 200
+
+        return {'available_slots': days[0]['slots'] if days else []}, 200
+
+    except ValueError as e:
+        return {'error': f'Formato de fecha inválido: {str(e)}'}, 400
+    except Exception as e:
+        print(f"Error getting available slots: {str(e)}")
+        traceback.print_exc()
+        return {'error': str(e)}, 500
+
+
+ASYNC_ROUTES = {
+    '/api/available-days': get_available_days,
+    '/api/available-range': get_available_range,
+    '/api/available-slots': get_available_slots,
+}
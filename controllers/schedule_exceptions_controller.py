@@ -0,0 +1,117 @@
+from flask import jsonify, request
+from models.models import db, Professional, ScheduleException
+from config.db_config import read_replica
+from utils.availability_cache import availability_cache
+from datetime import datetime, timedelta
+import traceback
+
+def parse_exception_bound(value, is_end):
+    """
+    Aceptar 'YYYY-MM-DD' (día completo) o 'YYYY-MM-DDTHH:MM'.
+    Una fecha sin hora como fin incluye el día completo
+    """
+    if len(value) == 10:
+        day = datetime.strptime(value, '%Y-%m-%d')
+        return day + timedelta(days=1) if is_end else day
+    return datetime.fromisoformat(value)
+
+def invalidate_exception_availability(exception):
+    """Los feriados del centro afectan a todos los profesionales"""
+    if exception.professional_id is None:
+        availability_cache.clear()
+    else:
+        availability_cache.invalidate_professional(exception.professional_id)
+
+@read_replica
+def get_schedule_exceptions():
+    """
+    Listar bloqueos de agenda
+    Query params: professional_id (incluye los feriados del centro), start_date, end_date
+    """
+    try:
+        professional_id = request.args.get('professional_id', type=int)
+        start_str = request.args.get('start_date')
+        end_str = request.args.get('end_date')
+
+        range_start = parse_exception_bound(start_str, False) if start_str else datetime.min
+        range_end = parse_exception_bound(end_str, True) if end_str else datetime.max
+
+        if professional_id:
+            query = ScheduleException.overlapping(professional_id, range_start, range_end)
+        else:
+            query = ScheduleException.query.filter(
+                ScheduleException.end_date > range_start,
+                ScheduleException.start_date < range_end
+            )
+
+        exceptions = query.order_by(ScheduleException.start_date).all()
+        return jsonify([exception.to_dict() for exception in exceptions]), 200
+    except ValueError as ve:
+        return jsonify({"error": f"Formato de fecha inválido: {str(ve)}"}), 400
+    except Exception as e:
+        print(f"Error getting schedule exceptions: {str(e)}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+def create_schedule_exception():
+    """
+    Crear un bloqueo de agenda
+    Body: professional_id (null = feriado del centro), start_date, end_date, kind, reason
+    """
+    try:
+        data = request.get_json()
+
+        if not data or not data.get('start_date') or not data.get('end_date'):
+            return jsonify({"error": "start_date y end_date son requeridos"}), 400
+
+        professional_id = data.get('professional_id')
+        if professional_id is not None and not Professional.query.get(professional_id):
+            return jsonify({"error": "Profesional no encontrado"}), 404
+
+        kind = data.get('kind') or ('holiday' if professional_id is None else 'absence')
+        if kind not in ScheduleException.KINDS:
+            return jsonify({"error": f"Tipo inválido. Tipos válidos: {', '.join(ScheduleException.KINDS)}"}), 400
+
+        start_date = parse_exception_bound(data['start_date'], False)
+        end_date = parse_exception_bound(data['end_date'], True)
+        if end_date <= start_date:
+            return jsonify({"error": "end_date debe ser posterior a start_date"}), 400
+
+        exception = ScheduleException(
+            professional_id=professional_id,
+            start_date=start_date,
+            end_date=end_date,
+            kind=kind,
+            reason=data.get('reason')
+        )
+        db.session.add(exception)
+        db.session.commit()
+        invalidate_exception_availability(exception)
+
+        return jsonify(exception.to_dict()), 201
+    except ValueError as ve:
+        db.session.rollback()
+        return jsonify({"error": f"Formato de fecha inválido: {str(ve)}"}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating schedule exception: {str(e)}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+def delete_schedule_exception(exception_id):
+    """Eliminar un bloqueo de agenda"""
+    try:
+        exception = ScheduleException.query.get(exception_id)
+        if not exception:
+            return jsonify({"error": "Bloqueo no encontrado"}), 404
+
+        db.session.delete(exception)
+        db.session.commit()
+        invalidate_exception_availability(exception)
+
+        return jsonify({"message": "Bloqueo eliminado exitosamente"}), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error deleting schedule exception: {str(e)}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
@@ -1,5 +1,9 @@
 from flask import jsonify, request
 from models.models import db, Specialty
+from config.db_config import read_replica
+from utils.availability_cache import availability_cache
+from utils.catalog import catalog, bump_catalog_version
+from utils.http_cache import cached_json, ADMIN_CATALOG_CACHE_CONTROL
 import traceback
 import re
 
@@ -8,15 +12,23 @@ def is_valid_hex_color(color):
     pattern = r'^#([A-Fa-f0-9]{6}|[A-Fa-f0-9]{3})$'
     return bool(re.match(pattern, color))
 
+@read_replica
 def get_services():
     """Obtener todas las especialidades/servicios"""
     try:
         include_professionals = request.args.get('include_professionals', 'false').lower() == 'true'
         
         specialties = Specialty.query.all()
-        result = [specialty.to_dict(include_professionals=include_professionals) for specialty in specialties]
+        professionals_by_specialty = Specialty.load_active_professionals() if include_professionals else None
+        result = [
+            specialty.to_dict(
+                include_professionals=include_professionals,
+                professionals_by_specialty=professionals_by_specialty
+            )
+            for specialty in specialties
+        ]
         
-        return jsonify(result), 200
+        return cached_json(result, cache_control=ADMIN_CATALOG_CACHE_CONTROL)
     except Exception as e:
         print(f"Error getting services: {str(e)}")
         traceback.print_exc()
@@ -43,7 +55,9 @@ def create_service():
         )
         
         db.session.add(service)
+        bump_catalog_version()
         db.session.commit()
+        catalog.invalidate()
         
         return jsonify(service.to_dict(include_professionals=True)), 201
     except Exception as e:
@@ -65,6 +79,7 @@ def update_service(service_id):
             service.name = data['name']
         if 'description' in data:
             service.description = data['description']
+        duration_changed = 'duration' in data and int(data['duration']) != service.duration
         if 'duration' in data:
             service.duration = int(data['duration'])
         if 'price' in data:
@@ -74,7 +89,13 @@ def update_service(service_id):
                 return jsonify({"error": "Color inválido. Debe ser un código hexadecimal (#RRGGBB)"}), 400
             service.color = data['color']
         
+        bump_catalog_version()
         db.session.commit()
+        catalog.invalidate()
+        if duration_changed:
+            # Los cupos de la especialidad cambian de largo; los intervalos ocupados
+            # de las citas ya agendadas usan su end_date guardado y no cambian
+            availability_cache.invalidate_specialty(service.id)
         return jsonify(service.to_dict(include_professionals=True)), 200
     except Exception as e:
         db.session.rollback()
@@ -99,7 +120,9 @@ def delete_service(service_id):
             }), 400
         
         db.session.delete(service)
+        bump_catalog_version()
         db.session.commit()
+        catalog.invalidate()
         
         return jsonify({"message": "Servicio eliminado exitosamente"}), 200
     except Exception as e:
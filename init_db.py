@@ -5,24 +5,14 @@ import os
 load_dotenv()
 
 from flask import Flask
-from config.db_config import db
+from config.db_config import db, configure_database
 from models.models import Professional, Patient, Specialty, Appointment, CenterConfig, ProfessionalSpecialty
 
 def init_database():
     """Inicializa la base de datos con datos de prueba"""
     app = Flask(__name__)
     
-    DATABASE_URL = os.getenv('DATABASE_URL')
-    if DATABASE_URL:
-        app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
-        print(f"✓ Conectando a PostgreSQL: {DATABASE_URL.split('@')[1].split('/')[0]}")
-    else:
-        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///encuadrado.db'
-        print("⚠ Usando SQLite local (no hay DATABASE_URL en .env)")
-    
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    
-    db.init_app(app)
+    configure_database(app)
     
     with app.app_context():
         db.drop_all()
@@ -75,7 +65,7 @@ def init_database():
         db.session.commit()
         print(f"✓ {len(especialidades)} especialidades creadas")
         
-        from werkzeug.security import generate_password_hash
+        from utils.auth import hash_password
         
         # ==================== HORARIOS POR ESPECIALIDAD ====================
         # Horario estándar para Psicología (lunes a viernes)
@@ -128,7 +118,7 @@ def init_database():
             Professional(
                 name='Administrador Centro',
                 email='admin@cuad.cl',
-                password_hash=generate_password_hash('1234'),
+                password_hash=hash_password('1234'),
                 role='admin',
                 schedule={}  # Admin no tiene horarios
             ),
@@ -137,7 +127,7 @@ def init_database():
             Professional(
                 name='Dr. Juan Pérez',
                 email='juan@cuad.cl',
-                password_hash=generate_password_hash('1234'),
+                password_hash=hash_password('1234'),
                 role='member',
                 schedule={
                     str(especialidades[2].id): horario_terapias,
@@ -149,7 +139,7 @@ def init_database():
             Professional(
                 name='Dra. Ana García',
                 email='ana@cuad.cl',
-                password_hash=generate_password_hash('1234'),
+                password_hash=hash_password('1234'),
                 role='member',
                 schedule={
                     str(especialidades[0].id): horario_psicologia,
@@ -160,7 +150,7 @@ def init_database():
             Professional(
                 name='Dr. Carlos Rojas',
                 email='carlos@cuad.cl',
-                password_hash=generate_password_hash('1234'),
+                password_hash=hash_password('1234'),
                 role='limited',
                 schedule={
                     str(especialidades[1].id): horario_psiquiatria,
@@ -171,7 +161,7 @@ def init_database():
             Professional(
                 name='Dra. Laura Martínez',
                 email='laura@cuad.cl',
-                password_hash=generate_password_hash('1234'),
+                password_hash=hash_password('1234'),
                 role='member',
                 schedule={
                     str(especialidades[4].id): horario_neuropsicologia,
@@ -351,35 +341,35 @@ def init_database():
                 name='María López',
                 email='maria.lopez@email.com',
                 phone='+56912345678',
-                rut='12345678-9',
+                rut='12345678-5',
                 birth_date=datetime(1990, 5, 15).date()
             ),
             Patient(
                 name='Pedro Sánchez',
                 email='pedro.sanchez@email.com',
                 phone='+56923456789',
-                rut='23456789-0',
+                rut='23456789-6',
                 birth_date=datetime(1985, 8, 20).date()
             ),
             Patient(
                 name='Laura Fernández',
                 email='laura.fernandez@email.com',
                 phone='+56934567890',
-                rut='34567890-1',
+                rut='34567890-5',
                 birth_date=datetime(1992, 3, 10).date()
             ),
             Patient(
                 name='Roberto Torres',
                 email='roberto.torres@email.com',
                 phone='+56945678901',
-                rut='45678901-2',
+                rut='45678901-3',
                 birth_date=datetime(1988, 11, 25).date()
             ),
             Patient(
                 name='Sofía Ramírez',
                 email='sofia.ramirez@email.com',
                 phone='+56956789012',
-                rut='56789012-3',
+                rut='56789012-0',
                 birth_date=datetime(1995, 7, 8).date()
             ),
         ]
@@ -449,6 +439,8 @@ def init_database():
         ]
         
         for cita in citas:
+            especialidad = next(e for e in especialidades if e.id == cita.specialty_id)
+            cita.end_date = cita.date + timedelta(minutes=especialidad.duration)
             db.session.add(cita)
         db.session.commit()
         print(f"✓ {len(citas)} citas creadas")
@@ -469,7 +461,7 @@ def init_database():
         # ==================== RESUMEN FINAL ====================
         print("\n" + "="*70)
         print("BASE DE DATOS INICIALIZADA CORRECTAMENTE")
-        print(f"Base de datos: {'PostgreSQL (Aiven)' if DATABASE_URL else 'SQLite Local'}")
+        print(f"Base de datos: {'PostgreSQL (Aiven)' if os.getenv('DATABASE_URL') else 'SQLite Local'}")
         print("="*70)
 
 
@@ -0,0 +1,48 @@
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from flask import Flask
+from config.db_config import db, configure_database
+from config.migrations import run_migrations
+import models.models  # noqa: F401 - registra los modelos en db.metadata
+
+def migrate_database():
+    """Aplica las migraciones de esquema sobre una base de datos existente"""
+    app = Flask(__name__)
+
+    configure_database(app)
+
+    with app.app_context():
+        result = run_migrations()
+        for name in result['columns']:
+            print(f"✓ Columna agregada: {name}")
+        if result['backfilled_end_dates']:
+            print(f"✓ {result['backfilled_end_dates']} citas con end_date completado")
+        if result['merged_patients']:
+            print(f"✓ {result['merged_patients']} pacientes duplicados por formato de RUT unidos")
+        if result['invalid_patient_ruts']:
+            print("⚠ Pacientes con RUT inválido (no se unieron ni normalizaron, corregir a mano):")
+            for entry in result['invalid_patient_ruts']:
+                print(f"   {entry}")
+        if result['backfilled_patient_search_keys']:
+            print(f"✓ {result['backfilled_patient_search_keys']} pacientes indexados para búsqueda")
+        for name in result['dropped_indexes']:
+            print(f"✓ Índice eliminado: {name}")
+        for name in result['indexes']:
+            print(f"✓ Índice creado: {name}")
+        if result['overlap_constraint']:
+            print("✓ Restricción de citas solapadas creada")
+        if result['overlap_conflicts']:
+            print("⚠ No se creó la restricción de citas solapadas; hay citas activas que se solapan:")
+            for first_id, second_id in result['overlap_conflicts']:
+                print(f"   citas {first_id} y {second_id}")
+        if result['normalized_schedules']:
+            print(f"✓ {len(result['normalized_schedules'])} horarios normalizados")
+        for message in result['invalid_schedules']:
+            print(f"⚠ Horario inválido del profesional {message}")
+        print("✓ Migración completa")
+
+
+if __name__ == "__main__":
+    migrate_database()
@@ -1,4 +1,7 @@
 from config.db_config import db
+from utils.text import normalize_text, normalize_email, normalize_rut, search_tokens
+from sqlalchemy import DDL, event, or_, inspect
+from sqlalchemy.orm import joinedload
 from datetime import datetime
 
 # Tabla intermedia MEJORADA para especialidades con términos y condiciones
@@ -13,6 +16,11 @@ class ProfessionalSpecialty(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        # La PK (professional_id, specialty_id) no sirve para buscar por especialidad
+        db.Index('ix_professional_specialties_specialty_id', 'specialty_id'),
+    )
+    
     def to_dict(self):
         return {
             'professional_id': self.professional_id,
@@ -51,27 +59,48 @@ class Professional(db.Model):
     
     appointments = db.relationship('Appointment', backref='professional', lazy=True)
     
-    def get_specialties_with_terms(self):
-        """Obtener especialidades con información de términos"""
-        result = []
-        for assoc in self.specialty_associations:
-            specialty = Specialty.query.get(assoc.specialty_id)
-            if specialty:
-                result.append({
-                    'id': specialty.id,
-                    'name': specialty.name,
-                    'description': specialty.description or '',
-                    'duration': specialty.duration,
-                    'price': specialty.price,
-                    'color': specialty.color or '#1976d2',
-                    'has_terms': assoc.has_terms,
-                    'is_active': assoc.is_active,
-                    'terms_and_conditions': assoc.terms_and_conditions,
-                    'updated_at': assoc.updated_at.isoformat() if assoc.updated_at else None,
-                })
+    @staticmethod
+    def load_specialty_associations(professional_ids):
+        """
+        Cargar asociaciones y especialidades de varios profesionales en una sola consulta.
+        Retorna {professional_id: [(ProfessionalSpecialty, Specialty), ...]}
+        """
+        result = {professional_id: [] for professional_id in professional_ids}
+        if not result:
+            return result
+        
+        rows = db.session.query(ProfessionalSpecialty, Specialty).join(
+            Specialty, Specialty.id == ProfessionalSpecialty.specialty_id
+        ).filter(
+            ProfessionalSpecialty.professional_id.in_(list(result.keys()))
+        ).order_by(ProfessionalSpecialty.professional_id, Specialty.id).all()
+        
+        for assoc, specialty in rows:
+            result[assoc.professional_id].append((assoc, specialty))
         return result
     
-    def to_dict(self, include_terms=False):
+    def get_specialties_with_terms(self, associations=None):
+        """Obtener especialidades con información de términos"""
+        if associations is None:
+            associations = Professional.load_specialty_associations([self.id])[self.id]
+        
+        return [
+            {
+                'id': specialty.id,
+                'name': specialty.name,
+                'description': specialty.description or '',
+                'duration': specialty.duration,
+                'price': specialty.price,
+                'color': specialty.color or '#1976d2',
+                'has_terms': assoc.has_terms,
+                'is_active': assoc.is_active,
+                'terms_and_conditions': assoc.terms_and_conditions,
+                'updated_at': assoc.updated_at.isoformat() if assoc.updated_at else None,
+            }
+            for assoc, specialty in associations
+        ]
+    
+    def to_dict(self, include_terms=False, associations=None):
         # El admin principal (admin@centro.com) no debe tener especialidades
         if self.email == 'admin@centro.com':
             return {
@@ -83,7 +112,7 @@ class Professional(db.Model):
                 'specialties': []
             }
         
-        specialties_data = self.get_specialties_with_terms() if include_terms else [
+        specialties_data = self.get_specialties_with_terms(associations) if include_terms else [
             {
                 'id': s.id,
                 'name': s.name,
@@ -120,8 +149,26 @@ class Patient(db.Model):
     rut = db.Column(db.String(12), unique=True, nullable=False)
     birth_date = db.Column(db.Date, nullable=False)
     
+    # Claves normalizadas para búsqueda (ver utils/text.py); se calculan al guardar.
+    # Son nulables solo para poder agregarlas a tablas existentes (ver config/migrations.py)
+    name_key = db.Column(db.String(100), nullable=True)
+    email_key = db.Column(db.String(100), nullable=True)
+    rut_key = db.Column(db.String(12), nullable=True)
+    
     appointments = db.relationship('Appointment', backref='patient', lazy=True)
     
+    __table_args__ = (
+        # Búsqueda exacta y por prefijo (en PostgreSQL LIKE 'x%' necesita text_pattern_ops).
+        # Único: las variantes de formato de un RUT son el mismo paciente (ver utils/patients.py)
+        db.Index('uq_patients_rut_key', 'rut_key', unique=True, postgresql_ops={'rut_key': 'text_pattern_ops'}),
+        db.Index('ix_patients_email_key', 'email_key', postgresql_ops={'email_key': 'text_pattern_ops'}),
+        # Trigramas sobre el nombre en PostgreSQL (requiere pg_trgm); en SQLite queda como índice normal
+        db.Index(
+            'ix_patients_name_key', 'name_key',
+            postgresql_using='gin', postgresql_ops={'name_key': 'gin_trgm_ops'}
+        ),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -132,6 +179,57 @@ class Patient(db.Model):
             'birth_date': self.birth_date.isoformat() if self.birth_date else None
         }
 
+class PatientSearchToken(db.Model):
+    """
+    Palabras normalizadas del nombre de cada paciente. Es el respaldo de la
+    búsqueda por nombre en bases sin trigramas (SQLite); en PostgreSQL no se llena
+    """
+    __tablename__ = 'patient_search_tokens'
+    
+    token = db.Column(db.String(100), primary_key=True)
+    patient_id = db.Column(db.Integer, db.ForeignKey('patients.id', ondelete='CASCADE'), primary_key=True)
+    
+    __table_args__ = (
+        db.Index('ix_patient_search_tokens_patient_id', 'patient_id'),
+    )
+
+PG_TRGM_DDL = "CREATE EXTENSION IF NOT EXISTS pg_trgm"
+
+event.listen(Patient.__table__, 'before_create', DDL(PG_TRGM_DDL).execute_if(dialect='postgresql'))
+
+@event.listens_for(Patient, 'before_insert')
+@event.listens_for(Patient, 'before_update')
+def set_patient_search_keys(mapper, connection, patient):
+    # El RUT se guarda siempre en su forma canónica ('12.345.678-k' -> '12345678-K')
+    patient.rut = normalize_rut(patient.rut)
+    patient.name_key = normalize_text(patient.name)[:100]
+    patient.email_key = normalize_email(patient.email)[:100]
+    patient.rut_key = patient.rut
+
+def sync_patient_search_tokens(connection, patient_id, name):
+    """Reemplazar las palabras indexadas de un paciente (no aplica en PostgreSQL)"""
+    if connection.dialect.name == 'postgresql':
+        return
+    table = PatientSearchToken.__table__
+    connection.execute(table.delete().where(table.c.patient_id == patient_id))
+    tokens = search_tokens(name)
+    if tokens:
+        connection.execute(table.insert(), [{'patient_id': patient_id, 'token': token} for token in tokens])
+
+@event.listens_for(Patient, 'after_insert')
+def index_new_patient(mapper, connection, patient):
+    sync_patient_search_tokens(connection, patient.id, patient.name)
+
+@event.listens_for(Patient, 'after_update')
+def reindex_patient(mapper, connection, patient):
+    if inspect(patient).attrs.name_key.history.has_changes():
+        sync_patient_search_tokens(connection, patient.id, patient.name)
+
+@event.listens_for(Patient, 'after_delete')
+def unindex_patient(mapper, connection, patient):
+    # SQLite no aplica ON DELETE CASCADE sin PRAGMA foreign_keys
+    sync_patient_search_tokens(connection, patient.id, None)
+
 class Specialty(db.Model):
     __tablename__ = 'specialties'
     
@@ -152,7 +250,38 @@ class Specialty(db.Model):
     
     appointments = db.relationship('Appointment', backref='specialty', lazy=True)
     
-    def to_dict(self, include_professionals=False):
+    @staticmethod
+    def load_active_professionals(specialty_ids=None):
+        """
+        Profesionales activos y con términos por especialidad en una sola consulta.
+        Retorna {specialty_id: [{'id', 'name', 'has_terms'}, ...]}
+        """
+        query = db.session.query(
+            ProfessionalSpecialty.specialty_id,
+            Professional.id,
+            Professional.name,
+            ProfessionalSpecialty.has_terms
+        ).join(
+            Professional, Professional.id == ProfessionalSpecialty.professional_id
+        ).filter(
+            Professional.email != 'admin@centro.com',
+            ProfessionalSpecialty.has_terms.is_(True),
+            ProfessionalSpecialty.is_active.is_(True)
+        )
+        
+        if specialty_ids is not None:
+            query = query.filter(ProfessionalSpecialty.specialty_id.in_(specialty_ids))
+        
+        result = {}
+        for specialty_id, prof_id, prof_name, has_terms in query.order_by(ProfessionalSpecialty.specialty_id, Professional.id):
+            result.setdefault(specialty_id, []).append({
+                'id': prof_id,
+                'name': prof_name,
+                'has_terms': has_terms,
+            })
+        return result
+    
+    def to_dict(self, include_professionals=False, professionals_by_specialty=None):
         result = {
             'id': self.id,
             'name': self.name,
@@ -164,15 +293,9 @@ class Specialty(db.Model):
         
         if include_professionals:
             # Excluir admin@centro.com y solo contar profesionales CON términos activos
-            active_professionals = []
-            for assoc in ProfessionalSpecialty.query.filter_by(specialty_id=self.id).all():
-                prof = Professional.query.get(assoc.professional_id)
-                if prof and prof.email != 'admin@centro.com' and assoc.has_terms and assoc.is_active:
-                    active_professionals.append({
-                        'id': prof.id,
-                        'name': prof.name,
-                        'has_terms': assoc.has_terms,
-                    })
+            if professionals_by_specialty is None:
+                professionals_by_specialty = Specialty.load_active_professionals([self.id])
+            active_professionals = professionals_by_specialty.get(self.id, [])
             
             result['professionals_count'] = len(active_professionals)
             result['professionals'] = active_professionals
@@ -187,28 +310,143 @@ class Appointment(db.Model):
     professional_id = db.Column(db.Integer, db.ForeignKey('professionals.id'), nullable=False)
     specialty_id = db.Column(db.Integer, db.ForeignKey('specialties.id'), nullable=False)
     date = db.Column(db.DateTime, nullable=False)
+    # Fin de la cita (date + duración de la especialidad al momento de reservar)
+    end_date = db.Column(db.DateTime, nullable=True)
     status = db.Column(db.String(20), default='pending')
     notes = db.Column(db.Text, nullable=True)
     cancellation_reason = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Serie recurrente que generó la cita (ver utils/series.py)
+    series_id = db.Column(db.Integer, db.ForeignKey('appointment_series.id'), nullable=True)
+    
+    __table_args__ = (
+        # Disponibilidad y verificación de cupos por profesional
+        db.Index('ix_appointments_professional_date_status', 'professional_id', 'date', 'status'),
+        # Solo citas que ocupan horario (pending/confirmed)
+        db.Index(
+            'ix_appointments_active_professional_date', 'professional_id', 'date',
+            postgresql_where=db.text("status IN ('pending', 'confirmed')"),
+            sqlite_where=db.text("status IN ('pending', 'confirmed')")
+        ),
+        # Regla de 15 días entre citas del mismo paciente
+        db.Index('ix_appointments_patient_professional_specialty_date', 'patient_id', 'professional_id', 'specialty_id', 'date'),
+        # Dashboard y listados por rango de fechas
+        db.Index('ix_appointments_date', 'date'),
+        db.Index('ix_appointments_series_id', 'series_id'),
+    )
+    
+    # Campos que se pueden pedir con `fields=` en los listados
+    SCALAR_FIELDS = (
+        'id', 'patient_id', 'professional_id', 'specialty_id', 'date',
+        'end_date', 'status', 'notes', 'cancellation_reason', 'created_at', 'series_id'
+    )
+    RELATED_FIELDS = ('patient', 'professional', 'specialty')
+    
+    @staticmethod
+    def eager_options(related=RELATED_FIELDS):
+        """Opciones para cargar paciente, profesional y especialidad en la misma consulta"""
+        return tuple(joinedload(getattr(Appointment, name)) for name in related)
+    
+    def _related_dict(self, name, memo):
+        """Serializar una entidad relacionada una sola vez por respuesta"""
+        key = (name, getattr(self, f'{name}_id'))
+        if key not in memo:
+            related = getattr(self, name)
+            if related is None:
+                memo[key] = None
+            elif name == 'professional':
+                memo[key] = {
+                    'id': related.id,
+                    'name': related.name,
+                    'email': related.email
+                }
+            else:
+                memo[key] = related.to_dict()
+        return memo[key]
+    
+    def to_dict(self, memo=None, fields=None):
+        """
+        Serializar la cita. `memo` permite reutilizar entre filas los diccionarios
+        de paciente, profesional y especialidad ya serializados; `fields` limita
+        la salida a los campos indicados.
+        """
+        if memo is None:
+            memo = {}
+        
+        if fields is None:
+            return {
+                'id': self.id,
+                'patient': self._related_dict('patient', memo),
+                'professional': self._related_dict('professional', memo),
+                'specialty': self._related_dict('specialty', memo),
+                'date': self.date.isoformat() if self.date else None,
+                'end_date': self.end_date.isoformat() if self.end_date else None,
+                'status': self.status,
+                'notes': self.notes,
+                'cancellation_reason': self.cancellation_reason,
+                'created_at': self.created_at.isoformat() if self.created_at else None,
+                'series_id': self.series_id
+            }
+        
+        result = {}
+        for field in fields:
+            if field in Appointment.RELATED_FIELDS:
+                result[field] = self._related_dict(field, memo)
+            else:
+                value = getattr(self, field)
+                result[field] = value.isoformat() if isinstance(value, datetime) else value
+        return result
+
+# Restricción de exclusión (solo PostgreSQL): un profesional no puede tener dos
+# citas activas que se solapen. Requiere la extensión btree_gist.
+APPOINTMENT_OVERLAP_CONSTRAINT = 'appointments_no_overlap'
+BTREE_GIST_DDL = "CREATE EXTENSION IF NOT EXISTS btree_gist"
+APPOINTMENT_OVERLAP_DDL = (
+    f"ALTER TABLE appointments ADD CONSTRAINT {APPOINTMENT_OVERLAP_CONSTRAINT} "
+    "EXCLUDE USING gist (professional_id WITH =, tsrange(date, end_date) WITH &&) "
+    "WHERE (status IN ('pending', 'confirmed'))"
+)
+
+event.listen(Appointment.__table__, 'before_create', DDL(BTREE_GIST_DDL).execute_if(dialect='postgresql'))
+event.listen(Appointment.__table__, 'after_create', DDL(APPOINTMENT_OVERLAP_DDL).execute_if(dialect='postgresql'))
+
+class AppointmentSeries(db.Model):
+    """Regla de recurrencia de un grupo de citas (sesiones semanales o quincenales)"""
+    __tablename__ = 'appointment_series'
+    
+    # Días entre sesiones según la frecuencia
+    FREQUENCIES = {'weekly': 7, 'biweekly': 14}
+    
+    id = db.Column(db.Integer, primary_key=True)
+    patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'), nullable=False)
+    professional_id = db.Column(db.Integer, db.ForeignKey('professionals.id'), nullable=False)
+    specialty_id = db.Column(db.Integer, db.ForeignKey('specialties.id'), nullable=False)
+    frequency = db.Column(db.String(20), nullable=False)
+    start_date = db.Column(db.DateTime, nullable=False)
+    count = db.Column(db.Integer, nullable=True)
+    until = db.Column(db.Date, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    appointments = db.relationship('Appointment', backref='series', lazy=True)
     
     def to_dict(self):
         return {
             'id': self.id,
-            'patient': self.patient.to_dict() if self.patient else None,
-            'professional': {
-                'id': self.professional.id,
-                'name': self.professional.name,
-                'email': self.professional.email
-            } if self.professional else None,
-            'specialty': self.specialty.to_dict() if self.specialty else None,
-            'date': self.date.isoformat() if self.date else None,
-            'status': self.status,
-            'notes': self.notes,
-            'cancellation_reason': self.cancellation_reason,
+            'patient_id': self.patient_id,
+            'professional_id': self.professional_id,
+            'specialty_id': self.specialty_id,
+            'frequency': self.frequency,
+            'start_date': self.start_date.isoformat() if self.start_date else None,
+            'count': self.count,
+            'until': self.until.isoformat() if self.until else None,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+def serialize_appointments(appointments, fields=None):
+    """Serializar una lista de citas compartiendo las entidades relacionadas"""
+    memo = {}
+    return [apt.to_dict(memo, fields) for apt in appointments]
+
 class CenterConfig(db.Model):
     __tablename__ = 'center_config'
     
@@ -232,4 +470,76 @@ class CenterConfig(db.Model):
             'email': self.email,
             'description': self.description,
             'logo_url': self.logo_url
-        }
\ No newline at end of file
+        }
+
+class CatalogVersion(db.Model):
+    """Contador que se incrementa con cada escritura del catálogo (especialidades, profesionales, centro)"""
+    __tablename__ = 'catalog_version'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class SchedulerLock(db.Model):
+    """
+    Lease de un proceso sobre un grupo de tareas periódicas (ver utils/scheduler.py).
+    Solo el dueño vigente ejecuta las tareas; si deja de renovar, otro lo reemplaza
+    """
+    __tablename__ = 'scheduler_locks'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    owner = db.Column(db.String(100), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+class ScheduleException(db.Model):
+    """
+    Bloqueo de agenda en un rango de fechas: feriado del centro (professional_id NULL),
+    ausencia de un profesional o bloqueo parcial de algunas horas
+    """
+    __tablename__ = 'schedule_exceptions'
+    
+    KINDS = ('holiday', 'absence', 'block')
+    
+    id = db.Column(db.Integer, primary_key=True)
+    professional_id = db.Column(db.Integer, db.ForeignKey('professionals.id'), nullable=True)
+    start_date = db.Column(db.DateTime, nullable=False)
+    end_date = db.Column(db.DateTime, nullable=False)
+    kind = db.Column(db.String(20), nullable=False, default='block')
+    reason = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # Búsqueda de bloqueos que se solapan con un rango: end_date > inicio AND start_date < fin
+        db.Index('ix_schedule_exceptions_professional_end_start', 'professional_id', 'end_date', 'start_date'),
+    )
+    
+    @staticmethod
+    def overlap_filters(professional_id, range_start, range_end):
+        """Filtros de los bloqueos del profesional y del centro que se solapan con [range_start, range_end)"""
+        return (
+            or_(
+                ScheduleException.professional_id == professional_id,
+                ScheduleException.professional_id.is_(None)
+            ),
+            ScheduleException.end_date > range_start,
+            ScheduleException.start_date < range_end
+        )
+    
+    @staticmethod
+    def overlapping(professional_id, range_start, range_end):
+        return ScheduleException.query.filter(
+            *ScheduleException.overlap_filters(professional_id, range_start, range_end)
+        )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'professional_id': self.professional_id,
+            'start_date': self.start_date.isoformat(),
+            'end_date': self.end_date.isoformat(),
+            'kind': self.kind,
+            'reason': self.reason,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
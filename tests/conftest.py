@@ -0,0 +1,56 @@
+from datetime import date
+
+import pytest
+
+from app import create_app
+from config.db_config import REPLICA_BIND
+from models.models import db, Patient, Professional, Specialty
+from utils.availability_cache import availability_cache
+from utils.catalog import catalog
+
+
+@pytest.fixture
+def app(tmp_path):
+    """App con dos archivos SQLite: la base principal y la réplica de lectura"""
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': 'test',
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'primary.db'}",
+        'SQLALCHEMY_BINDS': {REPLICA_BIND: f"sqlite:///{tmp_path / 'replica.db'}"},
+    })
+
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(db.engines[REPLICA_BIND])
+        yield app
+        db.session.remove()
+
+    catalog.clear()
+    availability_cache.clear()
+
+
+@pytest.fixture
+def specialty(app):
+    specialty = Specialty(name='Psicología', duration=60, price=50000)
+    db.session.add(specialty)
+    db.session.commit()
+    return specialty
+
+
+@pytest.fixture
+def professional(app):
+    professional = Professional(name='Ana Pérez', email='ana@example.com', password_hash='x', role='member')
+    db.session.add(professional)
+    db.session.commit()
+    return professional
+
+
+@pytest.fixture
+def patient(app):
+    patient = Patient(
+        name='Juan Soto', email='juan@example.com', phone='123',
+        rut='12.345.678-5', birth_date=date(1990, 1, 1)
+    )
+    db.session.add(patient)
+    db.session.commit()
+    return patient
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.models import db, Appointment, ScheduleException
+from utils.booking import SlotConflictError, reserve_appointment
+
+START = datetime(2030, 1, 7, 10, 0)
+
+
+def book(patient, professional, specialty, start, status='pending'):
+    appointment = Appointment(
+        patient_id=patient.id, professional_id=professional.id,
+        specialty_id=specialty.id, date=start, status=status
+    )
+    return reserve_appointment(appointment, specialty.duration)
+
+
+def test_reserve_sets_end_date(patient, professional, specialty):
+    appointment = book(patient, professional, specialty, START)
+    db.session.commit()
+
+    assert appointment.id is not None
+    assert appointment.end_date == START + timedelta(minutes=specialty.duration)
+
+
+def test_reserve_overlapping_appointment_conflicts(patient, professional, specialty):
+    first = book(patient, professional, specialty, START)
+    db.session.commit()
+
+    with pytest.raises(SlotConflictError) as error:
+        book(patient, professional, specialty, START + timedelta(minutes=30))
+    db.session.rollback()
+
+    assert error.value.conflicting.id == first.id
+    assert Appointment.query.count() == 1
+
+
+def test_reserve_adjacent_and_cancelled_slots_do_not_conflict(patient, professional, specialty):
+    book(patient, professional, specialty, START)
+    book(patient, professional, specialty, START + timedelta(hours=1), status='cancelled')
+    book(patient, professional, specialty, START + timedelta(hours=1))
+    db.session.commit()
+
+    assert Appointment.query.count() == 3
+
+
+def test_reserve_inside_schedule_exception_conflicts(patient, professional, specialty):
+    db.session.add(ScheduleException(
+        professional_id=professional.id, start_date=START, end_date=START + timedelta(hours=2), kind='absence'
+    ))
+    db.session.commit()
+
+    with pytest.raises(SlotConflictError):
+        book(patient, professional, specialty, START + timedelta(hours=1))
+    db.session.rollback()
+
+    assert Appointment.query.count() == 0
@@ -0,0 +1,61 @@
+from datetime import date
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from models.models import db, Patient
+from utils.patients import (
+    PatientMismatchError, PatientValidationError, duplicate_patient_message, patient_values, upsert_patient
+)
+
+
+def values(**overrides):
+    data = {
+        'name': 'Juan Soto', 'email': 'juan@example.com', 'phone': '123',
+        'rut': '12345678-5', 'birth_date': date(1990, 1, 1),
+    }
+    data.update(overrides)
+    return patient_values(**data)
+
+
+def test_upsert_updates_patient_with_same_rut_and_email(patient):
+    patient_id = upsert_patient(values(name='Juan Soto Pérez', email='JUAN@example.com', rut='12.345.678-5'))
+    db.session.commit()
+
+    assert patient_id == patient.id
+    assert Patient.query.count() == 1
+    assert db.session.get(Patient, patient.id).name == 'Juan Soto Pérez'
+
+
+def test_upsert_creates_patient_with_canonical_rut(app):
+    patient_id = upsert_patient(values(rut='7.654.321-6'))
+    db.session.commit()
+
+    assert db.session.get(Patient, patient_id).rut == '7654321-6'
+
+
+def test_upsert_rut_with_other_email_conflicts(patient):
+    with pytest.raises(PatientMismatchError):
+        upsert_patient(values(name='Otra Persona', email='otra@example.com'))
+    db.session.rollback()
+
+    assert db.session.get(Patient, patient.id).name == 'Juan Soto'
+
+
+def test_upsert_email_of_other_patient_conflicts(patient):
+    with pytest.raises(IntegrityError) as error:
+        upsert_patient(values(rut='7654321-6'))
+    db.session.rollback()
+
+    assert duplicate_patient_message(error.value) == 'El email ya está registrado'
+
+
+@pytest.mark.parametrize('rut', ['12345678-9', '1234', ''])
+def test_patient_values_rejects_invalid_rut(app, rut):
+    with pytest.raises(PatientValidationError):
+        values(rut=rut)
+
+
+def test_patient_values_rejects_non_string_email(app):
+    with pytest.raises(PatientValidationError):
+        values(email=123)
@@ -0,0 +1,57 @@
+from flask import g
+from sqlalchemy import text, update
+
+from config.db_config import REPLICA_BIND, read_replica
+from models.models import db, Specialty
+
+
+def specialty_names(engine):
+    with engine.connect() as connection:
+        return sorted(connection.execute(text('SELECT name FROM specialties')).scalars())
+
+
+def insert_into_replica(name):
+    with db.engines[REPLICA_BIND].begin() as connection:
+        connection.execute(
+            text("INSERT INTO specialties (name, duration, price, color) VALUES (:name, 30, 1000, '#000000')"),
+            {'name': name}
+        )
+
+
+def test_reads_use_primary_by_default(app, specialty):
+    insert_into_replica('Solo réplica')
+
+    with app.test_request_context():
+        assert [s.name for s in Specialty.query.order_by(Specialty.name)] == ['Psicología']
+
+
+def test_read_replica_reads_from_replica(app, specialty):
+    insert_into_replica('Solo réplica')
+
+    with app.test_request_context():
+        g.use_read_replica = True
+        assert [s.name for s in Specialty.query.order_by(Specialty.name)] == ['Solo réplica']
+
+
+def test_read_replica_writes_go_to_primary(app):
+    with app.test_request_context():
+        g.use_read_replica = True
+        db.session.add(Specialty(name='Nueva', duration=45, price=2000))
+        db.session.commit()
+
+        db.session.execute(update(Specialty).where(Specialty.name == 'Nueva').values(name='Editada'))
+        db.session.commit()
+
+    assert specialty_names(db.engine) == ['Editada']
+    assert specialty_names(db.engines[REPLICA_BIND]) == []
+
+
+def test_read_replica_decorator_routes_handler_reads(app, specialty):
+    insert_into_replica('Solo réplica')
+
+    @read_replica
+    def handler():
+        return [s.name for s in Specialty.query.all()]
+
+    with app.test_request_context():
+        assert handler() == ['Solo réplica']
@@ -0,0 +1,151 @@
+"""
+Transiciones de estado de las citas aplicadas por conjunto.
+
+Cada transición es un único UPDATE ... WHERE id IN (...) AND status IN (...)
+que solo toca las citas cuyo estado actual permite llegar al estado destino; la
+condición sobre el estado hace que dos transiciones concurrentes sobre la misma
+cita no se pisen. Con RETURNING se sabe en la misma sentencia qué citas cambiaron.
+"""
+
+from models.models import db, Appointment
+from utils.booking import ACTIVE_STATUSES, SlotConflictError, find_batch_conflicts, is_overlap_violation
+from utils.availability_cache import availability_cache
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+# Estado destino -> estados desde los que se puede llegar
+STATUS_TRANSITIONS = {
+    'confirmed': ('pending', 'to_confirm'),
+    'completed': ('confirmed', 'to_confirm'),
+    'cancelled': ('pending', 'to_confirm', 'confirmed'),
+    'missed': ('pending', 'to_confirm', 'confirmed'),
+}
+
+MAX_BULK_TRANSITION_IDS = 500
+
+
+def _apply_update(criteria, values):
+    """Ejecutar el UPDATE y retornar (id, professional_id, date) de las filas modificadas"""
+    columns = (Appointment.id, Appointment.professional_id, Appointment.date)
+    dialect = db.session.get_bind(mapper=Appointment).dialect
+
+    if dialect.update_returning:
+        statement = update(Appointment).where(*criteria).values(**values).returning(*columns)
+        return db.session.execute(statement, execution_options={'synchronize_session': False}).all()
+
+    # Sin RETURNING: leer las filas candidatas y actualizar exactamente esas
+    rows = db.session.execute(select(*columns).where(*criteria).with_for_update()).all()
+    if rows:
+        db.session.execute(
+            update(Appointment).where(Appointment.id.in_([row.id for row in rows]), *criteria).values(**values),
+            execution_options={'synchronize_session': False}
+        )
+    return rows
+
+
+def _split_confirm_conflicts(ids):
+    """
+    Separar las citas que no se pueden confirmar porque se solapan con otra cita
+    activa. Retorna (ids a actualizar, conflictos). Las 'to_confirm' pasan a ocupar
+    su horario al confirmarse, así que entre ellas gana la primera en el orden de ids
+    """
+    candidates = db.session.execute(
+        select(Appointment.id, Appointment.professional_id, Appointment.date, Appointment.end_date, Appointment.status)
+        .where(Appointment.id.in_(ids), Appointment.status.in_(STATUS_TRANSITIONS['confirmed']))
+    ).all()
+    if not candidates:
+        return ids, []
+
+    conflicts = find_batch_conflicts([row.id for row in candidates])
+    skipped = {conflict['appointment_id'] for conflict in conflicts}
+    by_id = {row.id: row for row in candidates}
+
+    activated = []
+    for appointment_id in ids:
+        row = by_id.get(appointment_id)
+        if row is None or row.id in skipped or row.status in ACTIVE_STATUSES:
+            continue
+        clash = next((
+            other for other in activated
+            if other.professional_id == row.professional_id and other.date < row.end_date and row.date < other.end_date
+        ), None)
+        if clash:
+            conflicts.append({'appointment_id': row.id, 'reason': 'appointment', 'conflicting_id': clash.id})
+            skipped.add(row.id)
+        else:
+            activated.append(row)
+
+    return [appointment_id for appointment_id in ids if appointment_id not in skipped], conflicts
+
+
+def transition_appointments(ids, target, cancellation_reason=None):
+    """
+    Llevar las citas `ids` al estado `target` cuando la transición es válida.
+    Retorna (filas actualizadas, {id: estado actual} de las que no cambiaron (las
+    inexistentes no aparecen), conflictos). No hace commit. Al confirmar se aplican
+    las mismas verificaciones que en reserve_appointment para un cambio de estado:
+    las citas que se solapan con otra cita activa no cambian y se informan en los
+    conflictos. Lanza SlotConflictError solo si una reserva concurrente ocupó el
+    horario durante la operación; el llamador debe hacer rollback en ese caso
+    """
+    values = {'status': target}
+    if target == 'cancelled':
+        values['cancellation_reason'] = cancellation_reason or 'Sin motivo especificado'
+
+    update_ids, conflicts = ids, []
+    if target == 'confirmed':
+        update_ids, conflicts = _split_confirm_conflicts(ids)
+
+    updated = []
+    if update_ids:
+        try:
+            updated = _apply_update(
+                (Appointment.id.in_(update_ids), Appointment.status.in_(STATUS_TRANSITIONS[target])),
+                values
+            )
+        except IntegrityError as e:
+            if is_overlap_violation(e):
+                raise SlotConflictError() from e
+            raise
+
+    updated_ids = {row.id for row in updated}
+    if target == 'confirmed' and updated_ids and db.engine.dialect.name != 'postgresql':
+        # Sin restricción de exclusión: verificar de nuevo con el lock de escritura tomado
+        late_conflicts = find_batch_conflicts(updated_ids)
+        if late_conflicts:
+            raise SlotConflictError(late_conflicts)
+
+    remaining = [appointment_id for appointment_id in ids if appointment_id not in updated_ids]
+    unchanged = {}
+    if remaining:
+        unchanged = dict(db.session.execute(
+            select(Appointment.id, Appointment.status).where(Appointment.id.in_(remaining))
+        ).all())
+
+    return updated, unchanged, conflicts
+
+
+def advance_appointment_states(now):
+    """
+    Transiciones automáticas por tiempo, con dos UPDATE por conjunto:
+    - pending -> to_confirm (la hora de la cita ya llegó y nadie la confirmó)
+    - confirmed -> completed (la cita ya pasó)
+    Las citas 'to_confirm' esperan que recepción las marque como completadas o
+    perdidas. Retorna las filas (id, professional_id, date) pasadas a to_confirm
+    y a completed. No hace commit
+    """
+    to_confirm = _apply_update(
+        (Appointment.status == 'pending', Appointment.date < now),
+        {'status': 'to_confirm'}
+    )
+    completed = _apply_update(
+        (Appointment.status == 'confirmed', Appointment.date < now),
+        {'status': 'completed'}
+    )
+    return to_confirm, completed
+
+
+def invalidate_transition_availability(rows):
+    """Invalidar la disponibilidad de los días de las citas que cambiaron de estado"""
+    for row in rows:
+        availability_cache.invalidate(row.professional_id, row.date)
@@ -0,0 +1,137 @@
+"""
+Hash de contraseñas y tokens de sesión.
+
+El costo del hash se configura con PASSWORD_HASH_METHOD (formato de werkzeug,
+p. ej. 'scrypt:32768:8:1' o 'pbkdf2:sha256:600000'); los hashes guardados con
+otro método se recalculan en el siguiente login exitoso.
+
+En el login se emite un token firmado con SECRET_KEY que lleva el id y el rol
+del profesional, así que resolver el profesional de una petición no requiere
+consultar la base de datos. Los clientes que aún envían ?user=email se
+resuelven con una caché LRU en memoria de TTL corto; los emails que no
+corresponden a ningún profesional no se guardan.
+"""
+
+from flask import current_app, g, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from werkzeug.security import check_password_hash, generate_password_hash
+from collections import OrderedDict
+import functools
+import os
+import threading
+import time
+
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+SESSION_TOKEN_MAX_AGE = int(os.getenv('SESSION_TOKEN_MAX_AGE', str(12 * 60 * 60)))
+PROFESSIONAL_SCOPE_CACHE_TTL = int(os.getenv('PROFESSIONAL_SCOPE_CACHE_TTL', '60'))
+PROFESSIONAL_SCOPE_CACHE_SIZE = int(os.getenv('PROFESSIONAL_SCOPE_CACHE_SIZE', '1024'))
+
+TOKEN_SALT = 'session-token'
+
+_scope_cache = OrderedDict()
+_scope_lock = threading.Lock()
+
+
+def hash_password(password):
+    """Hash de la contraseña con el método configurado"""
+    return generate_password_hash(password, method=PASSWORD_HASH_METHOD)
+
+
+@functools.lru_cache(maxsize=1)
+def _current_method_prefix():
+    # werkzeug completa los parámetros por defecto ('scrypt' -> 'scrypt:32768:8:1')
+    return hash_password('').split('$', 1)[0]
+
+
+def needs_rehash(password_hash):
+    """Indicar si el hash fue generado con un método o costo distinto al configurado"""
+    return password_hash.split('$', 1)[0] != _current_method_prefix()
+
+
+def verify_password(professional, password):
+    """
+    Verificar la contraseña y recalcular el hash si el método cambió.
+    Retorna (válida, rehasheada); si se rehasheó el llamador debe hacer commit
+    """
+    if not check_password_hash(professional.password_hash, password):
+        return False, False
+    if needs_rehash(professional.password_hash):
+        professional.password_hash = hash_password(password)
+        return True, True
+    return True, False
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=TOKEN_SALT)
+
+
+def issue_token(professional):
+    """Token de sesión firmado con el id, email y rol del profesional"""
+    return _serializer().dumps({
+        'id': professional.id,
+        'email': professional.email,
+        'role': professional.role,
+    })
+
+
+def get_token_claims():
+    """Datos del token Bearer de la petición actual, o None si no hay o no es válido"""
+    if 'token_claims' in g:
+        return g.token_claims
+
+    claims = None
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        try:
+            claims = _serializer().loads(header[len('Bearer '):], max_age=SESSION_TOKEN_MAX_AGE)
+        except BadSignature:
+            claims = None
+
+    g.token_claims = claims
+    return claims
+
+
+def _lookup_professional_scope(email):
+    from models.models import Professional
+
+    now = time.monotonic()
+    with _scope_lock:
+        entry = _scope_cache.get(email)
+        if entry and entry[1] > now:
+            _scope_cache.move_to_end(email)
+            return entry[0]
+
+    row = Professional.query.with_entities(
+        Professional.id, Professional.role
+    ).filter_by(email=email).first()
+    if row is None:
+        # El email viene de la petición: no guardar los que no existen
+        return None
+    scope = {'id': row.id, 'role': row.role}
+
+    with _scope_lock:
+        _scope_cache[email] = (scope, now + PROFESSIONAL_SCOPE_CACHE_TTL)
+        _scope_cache.move_to_end(email)
+        while len(_scope_cache) > PROFESSIONAL_SCOPE_CACHE_SIZE:
+            _scope_cache.popitem(last=False)
+    return scope
+
+
+def invalidate_professional_scope():
+    """Vaciar la caché email -> (id, rol) tras crear, editar o eliminar profesionales"""
+    with _scope_lock:
+        _scope_cache.clear()
+
+
+def scoped_professional_id(user_email=None):
+    """
+    Id del profesional por el que se deben filtrar las citas, o None si es admin
+    o no se identificó. Usa el token de sesión y, si no hay, el parámetro ?user=
+    """
+    scope = get_token_claims()
+    if scope is None and user_email:
+        scope = _lookup_professional_scope(user_email)
+
+    if scope and scope['role'] != 'admin':
+        return scope['id']
+    return None
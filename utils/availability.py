@@ -0,0 +1,150 @@
+"""
+Motor de disponibilidad basado en intervalos.
+
+Todos los tiempos se representan como minutos desde la medianoche y los
+intervalos son semiabiertos [inicio, fin). El horario del día, el almuerzo
+y las citas existentes se convierten una sola vez a intervalos ordenados;
+los horarios libres se obtienen por resta de intervalos y un único barrido.
+"""
+
+from datetime import datetime, time, timedelta
+
+SLOT_INTERVAL = 15
+DEFAULT_APPOINTMENT_DURATION = 60
+
+
+def parse_hhmm(value):
+    """Convertir 'HH:MM' a minutos desde la medianoche (None si viene vacío)"""
+    if not value:
+        return None
+    hours, minutes = value.split(':')
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or hours * 60 + minutes > 24 * 60:
+        raise ValueError(f"Hora inválida: {value}")
+    return hours * 60 + minutes
+
+
+def format_hhmm(minutes):
+    """Convertir minutos desde la medianoche a 'HH:MM'"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def merge_intervals(intervals):
+    """Ordenar y fusionar intervalos solapados o contiguos"""
+    merged = []
+    for start, end in sorted(intervals):
+        if start >= end:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(base, busy):
+    """
+    Restar los intervalos ocupados a los intervalos base.
+    Ambas listas se recorren una sola vez (base debe venir ordenada y sin solapes).
+    """
+    busy = merge_intervals(busy)
+    result = []
+    j = 0
+
+    for start, end in base:
+        cursor = start
+        # Saltar ocupados que terminan antes de este intervalo
+        while j < len(busy) and busy[j][1] <= cursor:
+            j += 1
+        k = j
+        while k < len(busy) and busy[k][0] < end:
+            busy_start, busy_end = busy[k]
+            if busy_start > cursor:
+                result.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+            if cursor >= end:
+                break
+            k += 1
+        if cursor < end:
+            result.append((cursor, end))
+
+    return result
+
+
+def free_slots(free, duration, anchor, step=SLOT_INTERVAL):
+    """
+    Generar los inicios de cita que caben completos en algún intervalo libre.
+    Los inicios se alinean a una grilla de `step` minutos a partir de `anchor`.
+    """
+    slots = []
+    for start, end in free:
+        offset = (start - anchor) % step
+        current = start if offset == 0 else start + (step - offset)
+        while current + duration <= end:
+            slots.append(current)
+            current += step
+    return slots
+
+
+def compute_available_slots(day, busy, duration, step=SLOT_INTERVAL):
+    """Horarios libres ('HH:MM') de un día compilado (DaySchedule) dados los intervalos ocupados"""
+    if day is None or not day.working:
+        return []
+
+    free = subtract_intervals(day.working, busy)
+    return [format_hhmm(minutes) for minutes in free_slots(free, duration, day.start, step)]
+
+
+def busy_intervals_by_day(appointments, durations):
+    """
+    Agrupar citas por fecha como intervalos ocupados en minutos del día.
+    Se usa el end_date guardado (el mismo que usa la restricción de solapamiento);
+    la duración actual de la especialidad solo cubre las citas sin end_date
+    """
+    busy_by_day = {}
+    for apt in appointments:
+        start = apt.date.hour * 60 + apt.date.minute
+        if apt.end_date is not None:
+            duration = int(-(-(apt.end_date - apt.date).total_seconds() // 60))
+        else:
+            duration = durations.get(apt.specialty_id) or DEFAULT_APPOINTMENT_DURATION
+        busy_by_day.setdefault(apt.date.date(), []).append((start, start + duration))
+    return busy_by_day
+
+
+def add_blocked_intervals(busy_by_day, exceptions, start_date, end_date):
+    """
+    Agregar a busy_by_day los bloqueos de agenda (feriados, ausencias, bloqueos
+    parciales) recortados a cada día entre start_date y end_date
+    """
+    for exception in exceptions:
+        current = max(exception.start_date.date(), start_date)
+        last = min(exception.end_date.date(), end_date)
+        while current <= last:
+            day_start = datetime.combine(current, time.min)
+            start = max(exception.start_date, day_start) - day_start
+            end = min(exception.end_date, day_start + timedelta(days=1)) - day_start
+            start, end = int(start.total_seconds() // 60), int(-(-end.total_seconds() // 60))
+            if start < end:
+                busy_by_day.setdefault(current, []).append((start, end))
+            current += timedelta(days=1)
+    return busy_by_day
+
+
+def compute_days_availability(weekly, busy_by_day, duration, start_date, end_date):
+    """
+    Días con al menos un horario libre entre start_date y end_date (ambos inclusive).
+    `weekly` es la tabla semanal compilada (ver utils.schedule.compile_weekly_schedule).
+    Los días habilitados en el horario pero sin cupos quedan fuera del resultado.
+    """
+    days = []
+    current = start_date
+    while current <= end_date:
+        day = weekly[current.weekday()]
+        if day is not None:
+            slots = compute_available_slots(day, busy_by_day.get(current, []), duration)
+            if slots:
+                days.append({'date': current.isoformat(), **day.info, 'slots': slots})
+        current += timedelta(days=1)
+    return days
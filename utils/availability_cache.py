@@ -0,0 +1,110 @@
+"""
+Caché en memoria de disponibilidad por (professional_id, specialty_id, fecha).
+
+Cada entrada guarda el día calculado por compute_days_availability (o None si
+el día no tiene cupos). Las escrituras que afectan la disponibilidad deben
+invalidar solo las claves afectadas. Como cada worker tiene su propia caché,
+las entradas además expiran tras un TTL corto para acotar la obsolescencia
+frente a escrituras hechas por otros procesos.
+"""
+
+from collections import OrderedDict
+from datetime import timedelta
+import os
+import threading
+import time
+
+_MISSING = object()
+
+
+class AvailabilityCache:
+    def __init__(self, max_size=4096, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._keys_by_professional = {}
+        self._lock = threading.Lock()
+
+    def get(self, professional_id, specialty_id, day):
+        """Obtener el valor cacheado de un día o _MISSING si no está o expiró"""
+        key = (professional_id, specialty_id, day)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, professional_id, specialty_id, day, value):
+        key = (professional_id, specialty_id, day)
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            self._keys_by_professional.setdefault(professional_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def get_range(self, professional_id, specialty_id, start_date, end_date):
+        """Días disponibles de un rango, o None si falta algún día en caché"""
+        days = []
+        current = start_date
+        while current <= end_date:
+            value = self.get(professional_id, specialty_id, current)
+            if value is _MISSING:
+                return None
+            if value is not None:
+                days.append(value)
+            current += timedelta(days=1)
+        return days
+
+    def set_range(self, professional_id, specialty_id, start_date, end_date, days):
+        """Guardar cada día del rango; los días sin cupos se guardan como None"""
+        by_date = {day['date']: day for day in days}
+        current = start_date
+        while current <= end_date:
+            self.set(professional_id, specialty_id, current, by_date.get(current.isoformat()))
+            current += timedelta(days=1)
+
+    def invalidate(self, professional_id, *days):
+        """Invalidar todas las especialidades de un profesional en las fechas indicadas"""
+        dates = {d.date() if hasattr(d, 'date') else d for d in days if d is not None}
+        with self._lock:
+            keys = self._keys_by_professional.get(professional_id, set())
+            for key in [k for k in keys if k[2] in dates]:
+                self._remove(key)
+
+    def invalidate_professional(self, professional_id):
+        """Invalidar todas las fechas de un profesional (cambios de horario o especialidades)"""
+        with self._lock:
+            for key in list(self._keys_by_professional.get(professional_id, ())):
+                self._remove(key)
+
+    def invalidate_specialty(self, specialty_id):
+        """Invalidar todas las fechas de una especialidad (cambia la duración de sus cupos)"""
+        with self._lock:
+            for key in [k for k in self._entries if k[1] == specialty_id]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_professional.clear()
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        keys = self._keys_by_professional.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_professional[key[0]]
+
+
+availability_cache = AvailabilityCache(
+    max_size=int(os.getenv('AVAILABILITY_CACHE_SIZE', '4096')),
+    ttl=int(os.getenv('AVAILABILITY_CACHE_TTL', '60'))
+)
@@ -0,0 +1,149 @@
+"""
+Reserva atómica de horarios.
+
+En PostgreSQL la restricción de exclusión `appointments_no_overlap` impide que
+dos citas activas de un mismo profesional se solapen, por lo que basta con
+insertar y traducir la violación a un conflicto. En otros motores (SQLite) la
+cita se inserta primero, lo que toma el lock de escritura de la base de datos,
+y recién entonces se verifica el solapamiento dentro de la misma transacción:
+ninguna otra escritura puede intercalarse entre la verificación y el commit.
+"""
+
+from models.models import db, Appointment, ScheduleException, APPOINTMENT_OVERLAP_CONSTRAINT
+from sqlalchemy import and_, inspect, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from datetime import timedelta
+
+ACTIVE_STATUSES = ('pending', 'confirmed')
+
+
+class SlotConflictError(Exception):
+    """El horario solicitado se solapa con otra cita activa del profesional"""
+
+    def __init__(self, conflicting=None):
+        super().__init__('Este horario ya no está disponible')
+        self.conflicting = conflicting
+
+
+def find_overlapping(professional_id, start, end, exclude_id=None):
+    """Primera cita activa del profesional que se solapa con [start, end)"""
+    query = Appointment.query.filter(
+        Appointment.professional_id == professional_id,
+        Appointment.status.in_(ACTIVE_STATUSES),
+        Appointment.date < end,
+        Appointment.end_date > start
+    )
+    if exclude_id is not None:
+        query = query.filter(Appointment.id != exclude_id)
+    return query.order_by(Appointment.date).first()
+
+
+def find_blocking_exception(professional_id, start, end):
+    """Primer bloqueo de agenda (del profesional o del centro) que se solapa con [start, end)"""
+    return ScheduleException.overlapping(professional_id, start, end).order_by(
+        ScheduleException.start_date
+    ).first()
+
+
+def find_batch_conflicts(ids, check_overlaps=True, new_slot_ids=()):
+    """
+    Conflictos de un conjunto de citas activas ya escritas en la sesión, con una
+    consulta por tipo: [{'appointment_id', 'reason', ...}] donde reason es
+    'appointment' (se solapa con otra cita activa, incluidas las del mismo
+    conjunto) o 'exception' (cae en un bloqueo de agenda). Igual que en
+    reserve_appointment, los bloqueos solo se verifican para las citas nuevas o
+    movidas (new_slot_ids); un cambio de estado no las invalida
+    """
+    booked = aliased(Appointment)
+    other = aliased(Appointment)
+    conflicts = []
+
+    if check_overlaps:
+        rows = db.session.execute(
+            select(booked.id, other.id).join(other, and_(
+                other.professional_id == booked.professional_id,
+                other.id != booked.id,
+                other.status.in_(ACTIVE_STATUSES),
+                other.date < booked.end_date,
+                other.end_date > booked.date
+            )).where(booked.id.in_(ids)).order_by(booked.id, other.id)
+        ).all()
+        conflicts += [
+            {'appointment_id': appointment_id, 'reason': 'appointment', 'conflicting_id': other_id}
+            for appointment_id, other_id in rows
+        ]
+
+    if new_slot_ids:
+        rows = db.session.execute(
+            select(booked.id, ScheduleException.id).join(
+                ScheduleException, and_(*ScheduleException.overlap_filters(booked.professional_id, booked.date, booked.end_date))
+            ).where(booked.id.in_(new_slot_ids)).order_by(booked.id, ScheduleException.id)
+        ).all()
+        conflicts += [
+            {'appointment_id': appointment_id, 'reason': 'exception', 'exception_id': exception_id}
+            for appointment_id, exception_id in rows
+        ]
+    return conflicts
+
+
+def is_overlap_violation(error):
+    """Detectar si un IntegrityError corresponde a la restricción de exclusión"""
+    orig = getattr(error, 'orig', None)
+    return (
+        getattr(orig, 'pgcode', None) == '23P01'
+        or APPOINTMENT_OVERLAP_CONSTRAINT in str(orig)
+    )
+
+
+def _books_new_slot(appointment):
+    """True si la cita es nueva o cambió de fecha o de profesional"""
+    state = inspect(appointment)
+    return (
+        state.transient
+        or state.pending
+        or state.attrs.date.history.has_changes()
+        or state.attrs.professional_id.history.has_changes()
+    )
+
+
+def reserve_appointment(appointment, duration):
+    """
+    Agregar (o actualizar) la cita en la sesión reservando su horario.
+    Lanza SlotConflictError si se solapa con otra cita activa o si una reserva
+    nueva (o movida a otra fecha o profesional) cae en un bloqueo de agenda; las
+    citas que ya estaban agendadas antes del bloqueo se pueden seguir confirmando.
+    Los cambios de la cita no deben haberse enviado aún con flush (cargar antes de
+    modificarla lo que provoque autoflush). El llamador debe hacer rollback en caso
+    de conflicto y commit en caso contrario.
+    """
+    appointment.end_date = appointment.date + timedelta(minutes=duration)
+    if appointment.status is None:
+        appointment.status = 'pending'
+
+    if appointment.status in ACTIVE_STATUSES and _books_new_slot(appointment) and find_blocking_exception(
+        appointment.professional_id, appointment.date, appointment.end_date
+    ):
+        raise SlotConflictError()
+
+    if appointment not in db.session:
+        db.session.add(appointment)
+
+    try:
+        db.session.flush()
+    except IntegrityError as e:
+        if is_overlap_violation(e):
+            raise SlotConflictError() from e
+        raise
+
+    if db.engine.dialect.name != 'postgresql' and appointment.status in ACTIVE_STATUSES:
+        conflicting = find_overlapping(
+            appointment.professional_id,
+            appointment.date,
+            appointment.end_date,
+            exclude_id=appointment.id
+        )
+        if conflicting:
+            raise SlotConflictError(conflicting)
+
+    return appointment
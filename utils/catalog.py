@@ -0,0 +1,227 @@
+"""
+Snapshot en memoria del catálogo: especialidades, profesionales, sus
+asociaciones (términos y horarios) y la configuración del centro.
+
+El snapshot es inmutable: cada reconstrucción arma uno nuevo y reemplaza la
+referencia de una sola vez, así que los lectores nunca ven un estado a medias.
+Las escrituras del catálogo incrementan `catalog_version` en su propia
+transacción (bump_catalog_version) y, tras el commit, invalidan el snapshot
+local (catalog.invalidate). Los demás workers detectan el cambio comparando
+la versión, consulta que se hace a lo más cada CATALOG_CHECK_INTERVAL segundos.
+"""
+
+from config.db_config import native_insert
+from models.models import db, Specialty, Professional, ProfessionalSpecialty, CenterConfig, CatalogVersion
+from utils.schedule import compile_schedule
+from sqlalchemy import select, update
+from datetime import datetime
+import os
+import threading
+import time
+
+CATALOG_CHECK_INTERVAL = float(os.getenv('CATALOG_CHECK_INTERVAL', '5'))
+CATALOG_VERSION_ID = 1
+
+
+class SpecialtyRecord:
+    __slots__ = ('id', 'name', 'description', 'duration', 'price', 'color')
+
+    def __init__(self, id, name, description, duration, price, color):
+        self.id = id
+        self.name = name
+        self.description = description
+        self.duration = duration
+        self.price = price
+        self.color = color
+
+
+class ProfessionalRecord:
+    # schedule es el JSON tal como está en la base de datos (no modificarlo);
+    # schedules es su versión compilada {specialty_id: tabla semanal}
+    __slots__ = ('id', 'name', 'email', 'role', 'schedule', 'schedules', 'specialties')
+
+    def __init__(self, id, name, email, role, schedule, specialties):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.role = role
+        self.schedule = schedule
+        self.schedules = compile_schedule(schedule)
+        self.specialties = specialties
+
+
+class AssociationRecord:
+    __slots__ = ('professional_id', 'specialty_id', 'terms_and_conditions', 'has_terms', 'is_active', 'updated_at')
+
+    def __init__(self, professional_id, specialty_id, terms_and_conditions, has_terms, is_active, updated_at):
+        self.professional_id = professional_id
+        self.specialty_id = specialty_id
+        self.terms_and_conditions = terms_and_conditions
+        self.has_terms = has_terms
+        self.is_active = is_active
+        self.updated_at = updated_at
+
+
+class CenterRecord:
+    __slots__ = ('name', 'address', 'phone', 'email', 'description', 'vision', 'logo_url', 'updated_at')
+
+    def __init__(self, name, address, phone, email, description, vision, logo_url, updated_at):
+        self.name = name
+        self.address = address
+        self.phone = phone
+        self.email = email
+        self.description = description
+        self.vision = vision
+        self.logo_url = logo_url
+        self.updated_at = updated_at
+
+
+class CatalogSnapshot:
+    __slots__ = ('version', 'specialties', 'professionals', 'associations', 'center')
+
+    def __init__(self, version, specialties, professionals, associations, center):
+        self.version = version
+        self.specialties = specialties        # {id: SpecialtyRecord} ordenado por id
+        self.professionals = professionals    # {id: ProfessionalRecord} ordenado por id
+        self.associations = associations      # {(professional_id, specialty_id): AssociationRecord}
+        self.center = center                  # CenterRecord o None
+
+    def professionals_with_specialty(self, specialty_id):
+        """Profesionales (no admin) que tienen asignada la especialidad"""
+        return [
+            prof for prof in self.professionals.values()
+            if prof.role != 'admin' and (prof.id, specialty_id) in self.associations
+        ]
+
+    def active_professionals(self, specialty_id):
+        """Profesionales activos y con términos de la especialidad (mismo criterio que Specialty.load_active_professionals)"""
+        return [
+            self.professionals[assoc.professional_id]
+            for assoc in self.associations.values()
+            if assoc.specialty_id == specialty_id
+            and assoc.has_terms and assoc.is_active
+            and self.professionals[assoc.professional_id].email != 'admin@centro.com'
+        ]
+
+
+def current_version(connection):
+    """Versión del catálogo en la base de datos (0 si aún no hay escrituras)"""
+    version = connection.execute(
+        select(CatalogVersion.version).where(CatalogVersion.id == CATALOG_VERSION_ID)
+    ).scalar()
+    return version or 0
+
+
+def bump_catalog_version():
+    """
+    Incrementar la versión dentro de la transacción actual (llamar antes del commit).
+    Con ON CONFLICT la primera escritura crea la fila sin competir con otra que
+    haga lo mismo al mismo tiempo
+    """
+    insert = native_insert(db.session.get_bind(mapper=CatalogVersion).dialect)
+    if insert is not None:
+        statement = insert(CatalogVersion).values(id=CATALOG_VERSION_ID, version=1)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[CatalogVersion.id],
+            set_={'version': CatalogVersion.version + 1, 'updated_at': datetime.utcnow()}
+        ))
+        return
+
+    result = db.session.execute(
+        update(CatalogVersion)
+        .where(CatalogVersion.id == CATALOG_VERSION_ID)
+        .values(version=CatalogVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        db.session.add(CatalogVersion(id=CATALOG_VERSION_ID, version=1))
+
+
+def build_snapshot(version, connection):
+    """Cargar el catálogo completo con cuatro consultas"""
+    specialties = {
+        row.id: SpecialtyRecord(row.id, row.name, row.description, row.duration, row.price, row.color)
+        for row in connection.execute(
+            select(
+                Specialty.id, Specialty.name, Specialty.description,
+                Specialty.duration, Specialty.price, Specialty.color
+            ).order_by(Specialty.id)
+        )
+    }
+
+    associations = {}
+    specialties_by_professional = {}
+    for row in connection.execute(
+        select(
+            ProfessionalSpecialty.professional_id, ProfessionalSpecialty.specialty_id,
+            ProfessionalSpecialty.terms_and_conditions, ProfessionalSpecialty.has_terms,
+            ProfessionalSpecialty.is_active, ProfessionalSpecialty.updated_at
+        ).order_by(ProfessionalSpecialty.professional_id, ProfessionalSpecialty.specialty_id)
+    ):
+        associations[(row.professional_id, row.specialty_id)] = AssociationRecord(*row)
+        if row.specialty_id in specialties:
+            specialties_by_professional.setdefault(row.professional_id, []).append(specialties[row.specialty_id])
+
+    professionals = {
+        row.id: ProfessionalRecord(
+            row.id, row.name, row.email, row.role, row.schedule or {},
+            tuple(specialties_by_professional.get(row.id, ()))
+        )
+        for row in connection.execute(
+            select(
+                Professional.id, Professional.name, Professional.email,
+                Professional.role, Professional.schedule
+            ).order_by(Professional.id)
+        )
+    }
+
+    center_row = connection.execute(
+        select(
+            CenterConfig.name, CenterConfig.address, CenterConfig.phone, CenterConfig.email,
+            CenterConfig.description, CenterConfig.vision, CenterConfig.logo_url, CenterConfig.updated_at
+        ).order_by(CenterConfig.id).limit(1)
+    ).first()
+    center = CenterRecord(*center_row) if center_row else None
+
+    return CatalogSnapshot(version, specialties, professionals, associations, center)
+
+
+class Catalog:
+    def __init__(self, check_interval=CATALOG_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._checked_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Snapshot vigente; verifica la versión en la base de datos a lo más cada check_interval segundos"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            now = time.monotonic()
+            if snapshot is not None and now - self._checked_at < self.check_interval:
+                return snapshot
+
+            # Siempre contra la base principal: con @read_replica la sesión lee la
+            # réplica, que tras un bump puede seguir entregando la versión anterior
+            with db.engine.connect() as connection:
+                version = current_version(connection)
+                if snapshot is None or snapshot.version != version:
+                    snapshot = build_snapshot(version, connection)
+                    self._snapshot = snapshot
+            self._checked_at = now
+            return snapshot
+
+    def invalidate(self):
+        """Forzar la verificación de versión en la próxima lectura (llamar tras el commit)"""
+        self._checked_at = float('-inf')
+
+    def clear(self):
+        with self._lock:
+            self._snapshot = None
+            self._checked_at = float('-inf')
+
+
+catalog = Catalog()
@@ -0,0 +1,25 @@
+"""
+Caché HTTP de las respuestas del catálogo.
+
+Las respuestas llevan un ETag fuerte (hash del contenido), Last-Modified
+cuando hay una marca de tiempo confiable y un Cache-Control configurable.
+Si el cliente o la CDN envían If-None-Match / If-Modified-Since y el recurso
+no cambió, se responde 304 sin cuerpo.
+"""
+
+from flask import jsonify, request
+import hashlib
+import os
+
+CATALOG_CACHE_CONTROL = os.getenv('CATALOG_CACHE_CONTROL', 'public, max-age=60, stale-while-revalidate=300')
+ADMIN_CATALOG_CACHE_CONTROL = os.getenv('ADMIN_CATALOG_CACHE_CONTROL', 'private, no-cache')
+
+
+def cached_json(payload, cache_control=CATALOG_CACHE_CONTROL, last_modified=None):
+    """Respuesta JSON condicional (200 con validadores o 304 si no cambió)"""
+    response = jsonify(payload)
+    response.set_etag(hashlib.sha256(response.get_data()).hexdigest())
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = cache_control
+    return response.make_conditional(request)
@@ -0,0 +1,115 @@
+"""
+Búsqueda de pacientes sobre columnas indexadas.
+
+Según la forma de la consulta se usa un solo índice:
+- RUT (empieza con un dígito): igualdad y prefijo sobre rut_key
+- email (contiene '@'): igualdad y prefijo sobre email_key
+- nombre: todas las palabras deben aparecer. En PostgreSQL se filtra con LIKE
+  '%palabra%' sobre el índice de trigramas de name_key y se ordena por
+  similarity(); en otras bases se buscan prefijos en patient_search_tokens.
+
+Los prefijos se comparan con LIKE en PostgreSQL (índices text_pattern_ops) y con
+un rango [prefijo, prefijo + U+10FFFF) en SQLite, cuyo LIKE no usa índices.
+"""
+
+from models.models import db, Patient, PatientSearchToken
+from utils.text import normalize_email, normalize_rut, normalize_rut_prefix, search_tokens
+from sqlalchemy import and_, case, func, literal, select, union_all
+
+MAX_QUERY_TOKENS = 5
+PREFIX_UPPER_BOUND = '\U0010ffff'
+
+
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def prefix_filter(column, prefix, dialect):
+    if dialect == 'postgresql':
+        return column.like(f'{escape_like(prefix)}%', escape='\\')
+    return and_(column >= prefix, column < prefix + PREFIX_UPPER_BOUND)
+
+
+def exact_first(column, value):
+    return case((column == value, 0), else_=1)
+
+
+def rut_query(q, dialect):
+    prefix = normalize_rut_prefix(q)
+    full = normalize_rut(q)
+    return Patient.query.filter(
+        (Patient.rut_key == full) | prefix_filter(Patient.rut_key, prefix, dialect)
+    ).order_by(exact_first(Patient.rut_key, full), Patient.rut_key, Patient.id)
+
+
+def email_query(q, dialect):
+    email = normalize_email(q)
+    return Patient.query.filter(
+        prefix_filter(Patient.email_key, email, dialect)
+    ).order_by(exact_first(Patient.email_key, email), Patient.email_key, Patient.id)
+
+
+def name_query_trigram(tokens):
+    """Todas las palabras contenidas en name_key; primero los que empiezan igual, luego por similitud"""
+    text = ' '.join(tokens)
+    return Patient.query.filter(
+        *[Patient.name_key.like(f'%{escape_like(token)}%', escape='\\') for token in tokens]
+    ).order_by(
+        case((Patient.name_key.like(f'{escape_like(text)}%', escape='\\'), 0), else_=1),
+        func.similarity(Patient.name_key, text).desc(),
+        Patient.name_key,
+        Patient.id
+    )
+
+
+def name_query_tokens(tokens, dialect):
+    """Cada palabra de la consulta debe ser prefijo de alguna palabra del nombre; primero las coincidencias exactas"""
+    matches = union_all(*[
+        select(
+            PatientSearchToken.patient_id.label('patient_id'),
+            literal(position).label('term'),
+            case((PatientSearchToken.token == token, 1), else_=0).label('exact')
+        ).where(prefix_filter(PatientSearchToken.token, token, dialect))
+        for position, token in enumerate(tokens)
+    ]).subquery()
+
+    ranked = select(
+        matches.c.patient_id,
+        func.sum(matches.c.exact).label('score')
+    ).group_by(matches.c.patient_id).having(
+        func.count(matches.c.term.distinct()) == len(tokens)
+    ).subquery()
+
+    return Patient.query.join(ranked, ranked.c.patient_id == Patient.id).order_by(
+        ranked.c.score.desc(), Patient.name_key, Patient.id
+    )
+
+
+def build_search_query(q):
+    """Query ordenada por relevancia, o None si la consulta no tiene nada que buscar"""
+    q = (q or '').strip()
+    dialect = db.session.get_bind(mapper=Patient).dialect.name
+
+    if q[:1].isdigit():
+        return rut_query(q, dialect)
+    if '@' in q:
+        return email_query(q, dialect)
+
+    tokens = search_tokens(q)[:MAX_QUERY_TOKENS]
+    if not tokens:
+        return None
+    if dialect == 'postgresql':
+        return name_query_trigram(tokens)
+    return name_query_tokens(tokens, dialect)
+
+
+def search_patients(q, limit, offset=0):
+    """
+    Una página de resultados: (pacientes, has_more).
+    Se pide una fila extra para saber si hay más resultados
+    """
+    query = build_search_query(q)
+    if query is None:
+        return [], False
+    patients = query.offset(offset).limit(limit + 1).all()
+    return patients[:limit], len(patients) > limit
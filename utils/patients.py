@@ -0,0 +1,129 @@
+"""
+Alta y actualización de pacientes identificados por su RUT canónico.
+
+`upsert_patient` crea o actualiza el paciente en una sola sentencia
+(INSERT ... ON CONFLICT (rut_key) DO UPDATE ... WHERE ... RETURNING id) en
+PostgreSQL y en SQLite >= 3.35. En otros motores se emula con una búsqueda por
+rut_key seguida del insert o update. Un paciente existente solo se actualiza si
+el email coincide: una reserva pública no puede reescribir los datos de otra
+persona que haya escrito el mismo RUT.
+
+Las sentencias INSERT no pasan por los eventos del modelo, por eso las claves
+de búsqueda se calculan aquí y las palabras indexadas se sincronizan a mano.
+"""
+
+from config.db_config import native_insert
+from models.models import db, Patient, sync_patient_search_tokens
+from utils.text import normalize_text, normalize_email, normalize_rut, is_valid_rut
+import re
+
+# Campos que se sobrescriben cuando el RUT ya existe y el email coincide
+UPSERT_FIELDS = ('name', 'phone', 'birth_date', 'name_key')
+
+
+# Restricciones únicas de patients: nombre en PostgreSQL o columnas en SQLite
+DUPLICATE_PATIENT_MESSAGES = {
+    'patients_email_key': 'El email ya está registrado',
+    'patients.email': 'El email ya está registrado',
+    'patients_rut_key': 'El RUT ya está registrado',
+    'patients.rut': 'El RUT ya está registrado',
+    'uq_patients_rut_key': 'El RUT ya está registrado',
+    'patients.rut_key': 'El RUT ya está registrado',
+}
+
+PG_UNIQUE_CONSTRAINT_RE = re.compile(r'unique constraint "([^"]+)"')
+SQLITE_UNIQUE_CONSTRAINT_PREFIX = 'UNIQUE constraint failed: '
+
+
+class PatientValidationError(ValueError):
+    """Los datos del paciente no tienen el tipo o el formato esperado"""
+
+
+class PatientMismatchError(Exception):
+    """El RUT ya pertenece a un paciente registrado con otro email"""
+
+    def __init__(self):
+        super().__init__('El RUT ya está registrado con otro email')
+
+
+def _violated_constraints(orig):
+    """Nombres de la restricción (PostgreSQL) o columnas (SQLite) de una violación de unicidad"""
+    name = getattr(getattr(orig, 'diag', None), 'constraint_name', None)
+    if name:
+        return [name]
+    message = str(orig)
+    match = PG_UNIQUE_CONSTRAINT_RE.search(message)
+    if match:
+        return [match.group(1)]
+    if message.startswith(SQLITE_UNIQUE_CONSTRAINT_PREFIX):
+        return [column.strip() for column in message[len(SQLITE_UNIQUE_CONSTRAINT_PREFIX):].split(',')]
+    return []
+
+
+def duplicate_patient_message(error):
+    """Mensaje para el usuario si el IntegrityError viene de un email o RUT repetido, o None"""
+    for constraint in _violated_constraints(getattr(error, 'orig', error)):
+        if constraint in DUPLICATE_PATIENT_MESSAGES:
+            return DUPLICATE_PATIENT_MESSAGES[constraint]
+    return None
+
+
+def patient_values(name, email, phone, rut, birth_date):
+    """
+    Columnas de un paciente con el RUT canónico y las claves de búsqueda ya calculadas.
+    Lanza PatientValidationError si el email no es texto o el RUT no es válido
+    """
+    if not isinstance(email, str):
+        raise PatientValidationError('El email debe ser texto')
+    if not is_valid_rut(rut):
+        raise PatientValidationError('RUT inválido')
+
+    rut = normalize_rut(rut)
+    return {
+        'name': name,
+        'email': email.strip(),
+        'phone': phone,
+        'rut': rut,
+        'birth_date': birth_date,
+        'name_key': normalize_text(name)[:100],
+        'email_key': normalize_email(email)[:100],
+        'rut_key': rut,
+    }
+
+
+def upsert_patient(values):
+    """
+    Crear el paciente o actualizar el que tiene el mismo RUT y email; retorna su id.
+    No hace commit. Lanza PatientMismatchError si el RUT es de un paciente con
+    otro email; si el email pertenece a otro paciente la sentencia falla con
+    IntegrityError (ver duplicate_patient_message)
+    """
+    insert = native_insert(db.session.get_bind(mapper=Patient).dialect)
+    if insert is None:
+        return _upsert_patient_emulated(values)
+
+    statement = insert(Patient).values(**values)
+    statement = statement.on_conflict_do_update(
+        index_elements=[Patient.rut_key],
+        set_={field: statement.excluded[field] for field in UPSERT_FIELDS},
+        where=Patient.email_key == statement.excluded.email_key
+    ).returning(Patient.id)
+
+    patient_id = db.session.execute(statement).scalar_one_or_none()
+    if patient_id is None:
+        raise PatientMismatchError()
+    sync_patient_search_tokens(db.session.connection(), patient_id, values['name'])
+    return patient_id
+
+
+def _upsert_patient_emulated(values):
+    patient = Patient.query.filter_by(rut_key=values['rut_key']).first()
+    if patient is None:
+        patient = Patient(rut=values['rut'], email=values['email'])
+        db.session.add(patient)
+    elif patient.email_key != values['email_key']:
+        raise PatientMismatchError()
+    for field in ('name', 'phone', 'birth_date'):
+        setattr(patient, field, values[field])
+    db.session.flush()
+    return patient.id
@@ -0,0 +1,175 @@
+"""
+Horarios de los profesionales.
+
+`Professional.schedule` se guarda como JSON {specialty_id: {día: {...}}} con
+horas 'HH:MM' ('' si no aplica), que es lo que consume el frontend. Al escribir
+se valida y se normaliza (claves de día largas, horas con dos dígitos, almuerzo
+dentro de la jornada). Para calcular disponibilidad cada horario se compila una sola vez en
+una tabla de 7 días (lunes=0) con minutos desde la medianoche e intervalos de
+atención ya calculados, así el cálculo por día no vuelve a parsear nada.
+"""
+
+from utils.availability import parse_hhmm, format_hhmm, subtract_intervals
+import logging
+
+logger = logging.getLogger(__name__)
+
+DAY_KEYS_LONG = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+DAY_KEYS_SHORT = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+TIME_FIELDS = ('start', 'end', 'lunch_start', 'lunch_end')
+
+
+class ScheduleValidationError(ValueError):
+    """El horario enviado no tiene un formato válido"""
+
+
+class DaySchedule:
+    __slots__ = ('day_key', 'start', 'end', 'working', 'info')
+
+    def __init__(self, day_key, start, end, working, info):
+        self.day_key = day_key
+        self.start = start          # minutos desde la medianoche (ancla de la grilla de horarios)
+        self.end = end
+        self.working = working      # tupla de intervalos de atención (jornada menos almuerzo)
+        self.info = info            # campos que se devuelven en la API
+
+
+def _raw_day(specialty_schedule, weekday):
+    """Día en formato JSON aceptando claves largas ('monday') o cortas ('mon')"""
+    return (
+        specialty_schedule.get(DAY_KEYS_LONG[weekday])
+        or specialty_schedule.get(DAY_KEYS_SHORT[weekday])
+        or None
+    )
+
+
+def _normalize_time(value, field, day_key):
+    try:
+        minutes = parse_hhmm(value)
+    except (AttributeError, TypeError, ValueError):
+        raise ScheduleValidationError(f"{day_key}.{field}: hora inválida '{value}' (formato HH:MM)")
+    return minutes
+
+
+def normalize_day(day, day_key):
+    """Validar un día y devolverlo en forma canónica"""
+    if not isinstance(day, dict):
+        raise ScheduleValidationError(f"{day_key}: debe ser un objeto")
+
+    enabled = day.get('enabled', False)
+    if not isinstance(enabled, bool):
+        raise ScheduleValidationError(f"{day_key}: enabled debe ser true o false")
+    times = {field: _normalize_time(day.get(field), field, day_key) for field in TIME_FIELDS}
+
+    if enabled:
+        if times['start'] is None or times['end'] is None:
+            raise ScheduleValidationError(f"{day_key}: start y end son requeridos si el día está habilitado")
+        if times['start'] >= times['end']:
+            raise ScheduleValidationError(f"{day_key}: start debe ser anterior a end")
+
+    if (times['lunch_start'] is None) != (times['lunch_end'] is None):
+        raise ScheduleValidationError(f"{day_key}: lunch_start y lunch_end deben venir juntos")
+
+    if enabled and times['lunch_start'] is not None:
+        if not (times['start'] <= times['lunch_start'] < times['lunch_end'] <= times['end']):
+            raise ScheduleValidationError(f"{day_key}: el almuerzo debe estar dentro de la jornada")
+
+    normalized = {'enabled': enabled}
+    for field in TIME_FIELDS:
+        # Las horas vacías se guardan como '' (igual que en los horarios creados por el frontend)
+        normalized[field] = format_hhmm(times[field]) if times[field] is not None else ''
+    return normalized
+
+
+def normalize_specialty_schedule(specialty_schedule):
+    """Horario semanal de una especialidad con claves de día largas"""
+    if not isinstance(specialty_schedule, dict):
+        raise ScheduleValidationError("El horario de cada especialidad debe ser un objeto")
+
+    valid_keys = set(DAY_KEYS_LONG) | set(DAY_KEYS_SHORT)
+    unknown = sorted(key for key in specialty_schedule if key not in valid_keys)
+    if unknown:
+        raise ScheduleValidationError(f"Días inválidos: {', '.join(unknown)}")
+
+    normalized = {}
+    for weekday, day_key in enumerate(DAY_KEYS_LONG):
+        day = _raw_day(specialty_schedule, weekday)
+        if day is not None:
+            normalized[day_key] = normalize_day(day, day_key)
+    return normalized
+
+
+def normalize_schedule(schedule):
+    """
+    Validar y normalizar un horario completo {specialty_id: {día: {...}}}.
+    Lanza ScheduleValidationError con un mensaje para el usuario si no es válido
+    """
+    if schedule is None:
+        return {}
+    if not isinstance(schedule, dict):
+        raise ScheduleValidationError("El horario debe ser un objeto {specialty_id: {día: {...}}}")
+
+    normalized = {}
+    for specialty_key, specialty_schedule in schedule.items():
+        if not str(specialty_key).isdigit():
+            raise ScheduleValidationError(f"Especialidad inválida en el horario: '{specialty_key}'")
+        try:
+            normalized[str(int(specialty_key))] = normalize_specialty_schedule(specialty_schedule)
+        except ScheduleValidationError as e:
+            raise ScheduleValidationError(f"Especialidad {specialty_key}: {e}")
+    return normalized
+
+
+def compile_day(day, day_key):
+    """DaySchedule de un día habilitado, o None si no atiende"""
+    if not day or not day.get('enabled'):
+        return None
+
+    start = parse_hhmm(day.get('start'))
+    end = parse_hhmm(day.get('end'))
+    if start is None or end is None or start >= end:
+        return None
+
+    working = [(start, end)]
+    lunch_start = parse_hhmm(day.get('lunch_start'))
+    lunch_end = parse_hhmm(day.get('lunch_end'))
+    if lunch_start is not None and lunch_end is not None and lunch_start < lunch_end:
+        working = subtract_intervals(working, [(lunch_start, lunch_end)])
+
+    info = {
+        'day': day_key,
+        'start': day.get('start'),
+        'end': day.get('end'),
+        'lunch_start': day.get('lunch_start'),
+        'lunch_end': day.get('lunch_end'),
+    }
+    return DaySchedule(day_key, start, end, tuple(working), info)
+
+
+def compile_weekly_schedule(specialty_schedule):
+    """
+    Tabla semanal (tupla de 7 DaySchedule o None) de una especialidad.
+    Tolera horarios antiguos sin normalizar; los días inválidos quedan sin atención
+    """
+    weekly = []
+    for weekday in range(7):
+        if not specialty_schedule:
+            weekly.append(None)
+            continue
+        day = _raw_day(specialty_schedule, weekday)
+        day_key = DAY_KEYS_LONG[weekday] if specialty_schedule.get(DAY_KEYS_LONG[weekday]) else DAY_KEYS_SHORT[weekday]
+        try:
+            weekly.append(compile_day(day, day_key))
+        except (AttributeError, TypeError, ValueError):
+            logger.warning("Horario inválido ignorado para %s: %r", day_key, day)
+            weekly.append(None)
+    return tuple(weekly)
+
+
+def compile_schedule(schedule):
+    """{specialty_id (int): tabla semanal} para todas las especialidades del horario"""
+    compiled = {}
+    for specialty_key, specialty_schedule in (schedule or {}).items():
+        if str(specialty_key).isdigit() and isinstance(specialty_schedule, dict):
+            compiled[int(specialty_key)] = compile_weekly_schedule(specialty_schedule)
+    return compiled
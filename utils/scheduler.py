@@ -0,0 +1,169 @@
+"""
+Tareas periódicas en segundo plano.
+
+Las transiciones de estado por tiempo (utils/appointment_status.py) corren como
+UPDATE por conjunto en un hilo de cada worker, no en las lecturas del dashboard.
+Para que solo un worker las ejecute, los procesos compiten por un lease en la
+tabla scheduler_locks: el dueño lo renueva en cada ciclo y, si el proceso muere,
+el lease expira tras SCHEDULER_LEASE_SECONDS y otro worker toma el relevo.
+
+Cada app tiene su propio JobScheduler (app.extensions['scheduler']). El hilo se
+inicia con el primer request del worker (así los comandos de la CLI no lo
+levantan) y al salir el proceso se detiene con atexit, liberando el lease para
+que otro worker lo tome sin esperar que expire. En las apps de pruebas
+(app.testing) está desactivado salvo que se pida con STATUS_SCHEDULER_ENABLED.
+Para usar cron en vez del hilo: STATUS_SCHEDULER_ENABLED=false y
+`flask --app "app:create_app" run-jobs` cada minuto.
+"""
+
+from models.models import db, SchedulerLock
+from utils.appointment_status import advance_appointment_states, invalidate_transition_availability
+from sqlalchemy import update, or_
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
+import atexit
+import logging
+import os
+import socket
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_ENABLED = os.getenv('STATUS_SCHEDULER_ENABLED', 'true').lower() == 'true'
+STATUS_JOB_INTERVAL = float(os.getenv('STATUS_JOB_INTERVAL', '60'))
+SCHEDULER_LEASE_SECONDS = float(os.getenv('SCHEDULER_LEASE_SECONDS', '180'))
+SCHEDULER_LOCK_NAME = 'status_jobs'
+
+
+def run_status_transitions():
+    """pending -> to_confirm y confirmed -> completed para las citas cuya hora ya pasó"""
+    to_confirm, completed = advance_appointment_states(datetime.now())
+    db.session.commit()
+    invalidate_transition_availability(to_confirm + completed)
+    return {'to_confirm': len(to_confirm), 'completed': len(completed)}
+
+
+JOBS = (
+    ('status_transitions', run_status_transitions),
+)
+
+
+def new_owner_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+def acquire_lease(owner, lease_seconds=SCHEDULER_LEASE_SECONDS, name=SCHEDULER_LOCK_NAME):
+    """Tomar o renovar el lease; True si `owner` queda como dueño"""
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=lease_seconds)
+    result = db.session.execute(
+        update(SchedulerLock)
+        .where(SchedulerLock.name == name, or_(SchedulerLock.owner == owner, SchedulerLock.expires_at < now))
+        .values(owner=owner, expires_at=expires_at)
+    )
+    if result.rowcount == 0:
+        try:
+            db.session.add(SchedulerLock(name=name, owner=owner, expires_at=expires_at))
+            db.session.flush()
+        except IntegrityError:
+            # El lease existe y tiene otro dueño vigente
+            db.session.rollback()
+            return False
+    db.session.commit()
+    return True
+
+
+def release_lease(owner, name=SCHEDULER_LOCK_NAME):
+    db.session.execute(
+        update(SchedulerLock)
+        .where(SchedulerLock.name == name, SchedulerLock.owner == owner)
+        .values(expires_at=datetime.utcnow())
+    )
+    db.session.commit()
+
+
+def run_jobs_once(owner, release=False):
+    """
+    Ejecutar todas las tareas si `owner` obtiene el lease.
+    Retorna {tarea: resultado} o None si otro proceso es el dueño
+    """
+    if not acquire_lease(owner):
+        return None
+
+    results = {}
+    try:
+        for name, job in JOBS:
+            try:
+                results[name] = job()
+            except Exception as e:
+                db.session.rollback()
+                logger.exception("Error en la tarea %s", name)
+                results[name] = {'error': str(e)}
+    finally:
+        if release:
+            release_lease(owner)
+    return results
+
+
+class JobScheduler:
+    """Hilo que ejecuta las tareas de una app cada `interval` segundos mientras el proceso tenga el lease"""
+
+    def __init__(self, app=None, interval=STATUS_JOB_INTERVAL):
+        self.interval = interval
+        self._app = None
+        self._thread = None
+        self._owner = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self._app = app
+        app.extensions['scheduler'] = self
+        if app.config.get('STATUS_SCHEDULER_ENABLED', SCHEDULER_ENABLED and not app.testing):
+            app.before_request(self.start)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            # El id se genera en el worker (después del fork), no en el proceso maestro
+            self._owner = new_owner_id()
+            self._thread = threading.Thread(target=self._run, name='job-scheduler', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Detener el hilo y liberar el lease para que otro worker lo tome sin esperar que expire"""
+        self._stop.set()
+        if self._thread is None:
+            return
+        self._thread.join(timeout=self.interval)
+        self._thread = None
+        with self._app.app_context():
+            try:
+                release_lease(self._owner)
+            except Exception:
+                db.session.rollback()
+                logger.exception("No se pudo liberar el lease de tareas periódicas")
+            finally:
+                db.session.remove()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._app.app_context():
+                try:
+                    results = run_jobs_once(self._owner)
+                    if results:
+                        logger.info("Tareas periódicas ejecutadas: %s", results)
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("Error en el ciclo de tareas periódicas")
+                finally:
+                    db.session.remove()
+            self._stop.wait(self.interval)
+
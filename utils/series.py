@@ -0,0 +1,171 @@
+"""
+Series de citas recurrentes.
+
+Una serie genera todas sus sesiones de una vez. Para verificar los conflictos no
+se consulta sesión por sesión: se trae con una consulta cada una las citas
+activas y los bloqueos de agenda del profesional en el rango completo de la
+serie, y cada sesión se compara en memoria contra ellos y contra el horario
+compilado del profesional (snapshot del catálogo). Las sesiones libres se
+insertan en una sola sentencia INSERT ... RETURNING, o fila por fila si el motor
+no la soporta (SQLite < 3.35).
+
+La atomicidad es la misma que en utils/booking.py: en PostgreSQL la restricción
+de exclusión rechaza el insert si otra reserva se adelantó; en otros motores se
+inserta primero (tomando el lock de escritura) y se vuelve a verificar dentro de
+la misma transacción.
+"""
+
+from models.models import db, Appointment, AppointmentSeries, ScheduleException
+from utils.booking import ACTIVE_STATUSES, SlotConflictError, is_overlap_violation
+from utils.availability_cache import availability_cache
+from utils.catalog import catalog
+from config.db_config import supports_insert_returning
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from datetime import timedelta
+
+MAX_SERIES_OCCURRENCES = 52
+
+
+class SeriesValidationError(ValueError):
+    """La regla de recurrencia no es válida"""
+
+
+def series_occurrences(start, frequency, count=None, until=None):
+    """
+    Inicio de cada sesión: cada 7 o 14 días desde start hasta completar count
+    sesiones o pasar la fecha until (inclusive), con un máximo de MAX_SERIES_OCCURRENCES
+    """
+    if frequency not in AppointmentSeries.FREQUENCIES:
+        raise SeriesValidationError(
+            f"Frecuencia inválida. Frecuencias válidas: {', '.join(AppointmentSeries.FREQUENCIES)}"
+        )
+    if count is None and until is None:
+        raise SeriesValidationError("Se requiere count o until")
+    if count is not None and not 1 <= count <= MAX_SERIES_OCCURRENCES:
+        raise SeriesValidationError(f"count debe estar entre 1 y {MAX_SERIES_OCCURRENCES}")
+    if until is not None and until < start.date():
+        raise SeriesValidationError("until debe ser posterior al inicio de la serie")
+
+    step = timedelta(days=AppointmentSeries.FREQUENCIES[frequency])
+    limit = count or MAX_SERIES_OCCURRENCES
+    occurrences = []
+    current = start
+    while len(occurrences) < limit and (until is None or current.date() <= until):
+        occurrences.append(current)
+        current += step
+
+    if until is not None and count is None and current.date() <= until:
+        raise SeriesValidationError(f"La serie supera el máximo de {MAX_SERIES_OCCURRENCES} sesiones")
+    return occurrences
+
+
+def _outside_schedule(weekly, start, duration):
+    """True si [start, start + duration) no cabe en un intervalo de atención del día"""
+    day = weekly[start.weekday()] if weekly else None
+    if day is None:
+        return True
+    begin = start.hour * 60 + start.minute
+    end = begin + duration
+    return not any(work_start <= begin and end <= work_end for work_start, work_end in day.working)
+
+
+def find_series_conflicts(professional_id, specialty_id, occurrences, duration, exclude_ids=()):
+    """
+    Conflictos de cada sesión: lista de {'date', 'reason', ...} donde reason es
+    'schedule' (fuera del horario de atención), 'appointment' (se solapa con otra
+    cita activa) o 'exception' (cae en un bloqueo de agenda)
+    """
+    if not occurrences:
+        return []
+
+    length = timedelta(minutes=duration)
+    range_start = occurrences[0]
+    range_end = occurrences[-1] + length
+
+    booked_query = db.session.query(Appointment.id, Appointment.date, Appointment.end_date).filter(
+        Appointment.professional_id == professional_id,
+        Appointment.status.in_(ACTIVE_STATUSES),
+        Appointment.date < range_end,
+        Appointment.end_date > range_start
+    )
+    if exclude_ids:
+        booked_query = booked_query.filter(Appointment.id.notin_(exclude_ids))
+    booked = booked_query.all()
+
+    blocked = ScheduleException.overlapping(professional_id, range_start, range_end).with_entities(
+        ScheduleException.id, ScheduleException.start_date, ScheduleException.end_date
+    ).all()
+
+    professional = catalog.get().professionals.get(professional_id)
+    weekly = professional.schedules.get(specialty_id) if professional else None
+
+    conflicts = []
+    for start in occurrences:
+        end = start + length
+        conflict = None
+        if _outside_schedule(weekly, start, duration):
+            conflict = {'reason': 'schedule'}
+        else:
+            appointment = next((row for row in booked if row.date < end and row.end_date > start), None)
+            if appointment:
+                conflict = {'reason': 'appointment', 'appointment_id': appointment.id}
+            else:
+                exception = next((row for row in blocked if row.start_date < end and row.end_date > start), None)
+                if exception:
+                    conflict = {'reason': 'exception', 'exception_id': exception.id}
+        if conflict:
+            conflicts.append({'date': start.isoformat(), **conflict})
+    return conflicts
+
+
+def reserve_series(series, occurrences, duration, status='pending', notes=''):
+    """
+    Insertar las sesiones de la serie en una sola sentencia y retornar las citas.
+    Lanza SlotConflictError si alguna se solapa con una reserva concurrente; el
+    llamador debe hacer rollback en ese caso y commit en caso contrario
+    """
+    db.session.add(series)
+    db.session.flush()
+
+    length = timedelta(minutes=duration)
+    rows = [
+        {
+            'patient_id': series.patient_id,
+            'professional_id': series.professional_id,
+            'specialty_id': series.specialty_id,
+            'series_id': series.id,
+            'date': start,
+            'end_date': start + length,
+            'status': status,
+            'notes': notes,
+        }
+        for start in occurrences
+    ]
+
+    try:
+        if supports_insert_returning(db.engine.dialect):
+            appointments = db.session.scalars(insert(Appointment).returning(Appointment), rows).all()
+        else:
+            appointments = [Appointment(**row) for row in rows]
+            db.session.add_all(appointments)
+            db.session.flush()
+    except IntegrityError as e:
+        if is_overlap_violation(e):
+            raise SlotConflictError() from e
+        raise
+
+    if db.engine.dialect.name != 'postgresql' and status in ACTIVE_STATUSES:
+        conflicts = find_series_conflicts(
+            series.professional_id, series.specialty_id, occurrences, duration,
+            exclude_ids=[appointment.id for appointment in appointments]
+        )
+        if any(conflict['reason'] == 'appointment' for conflict in conflicts):
+            raise SlotConflictError(conflicts)
+
+    return appointments
+
+
+def invalidate_series_availability(professional_id, occurrences):
+    for start in occurrences:
+        availability_cache.invalidate(professional_id, start)
@@ -0,0 +1,71 @@
+"""
+Normalización de texto para búsquedas.
+
+Las claves normalizadas se guardan junto al dato original (Patient.name_key,
+email_key, rut_key) para que las búsquedas comparen contra columnas indexadas
+en vez de aplicar funciones a cada fila.
+"""
+
+import re
+import unicodedata
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+RUT_SEPARATORS_RE = re.compile(r'[.\s-]')
+RUT_RE = re.compile(r'^(\d{1,8})([0-9K])$')
+
+
+def normalize_text(value):
+    """Minúsculas, sin tildes y con los espacios colapsados ('José  Pérez' -> 'jose perez')"""
+    if not value:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', value)
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.lower().split())
+
+
+def normalize_email(value):
+    return (value or '').strip().lower()
+
+
+def rut_check_digit(body):
+    """Dígito verificador (módulo 11) del número de un RUT ('12345678' -> '5')"""
+    total = sum(int(digit) * (2 + position % 6) for position, digit in enumerate(reversed(body)))
+    remainder = 11 - total % 11
+    return {11: '0', 10: 'K'}.get(remainder, str(remainder))
+
+
+def _split_rut(value):
+    """(número, dígito verificador) si el RUT tiene formato válido y su dígito cuadra, o None"""
+    if not isinstance(value, str):
+        return None
+    match = RUT_RE.match(RUT_SEPARATORS_RE.sub('', value.upper()))
+    if not match or rut_check_digit(match.group(1)) != match.group(2):
+        return None
+    return match.group(1).lstrip('0') or '0', match.group(2)
+
+
+def is_valid_rut(value):
+    return _split_rut(value) is not None
+
+
+def normalize_rut(value):
+    """
+    RUT canónico: sin puntos ni espacios, con guion y dígito verificador en
+    mayúscula ('12.345.678-k' -> '12345678-K'). Solo se normalizan los RUT
+    válidos; los demás se devuelven tal cual (sin espacios en los extremos) para
+    que dos valores distintos no terminen con la misma clave
+    """
+    parts = _split_rut(value)
+    if parts is None:
+        return (value or '').strip()
+    return f'{parts[0]}-{parts[1]}'
+
+
+def normalize_rut_prefix(value):
+    """RUT parcial tal como lo escribe el usuario, sin puntos ni espacios ('12.345' -> '12345')"""
+    return re.sub(r'[.\s]', '', (value or '').upper())
+
+
+def search_tokens(value):
+    """Palabras normalizadas y sin repetir de un texto, en orden de aparición"""
+    return list(dict.fromkeys(TOKEN_RE.findall(normalize_text(value))))